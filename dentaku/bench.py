@@ -0,0 +1,336 @@
+"""Benchmark harness for the dentaku calculator implementations.
+
+Usage:
+  - ``python3 bench.py``
+  - ``python3 bench.py -n 20000 -o bench_results.json``
+
+Each calculator is driven through its core arithmetic path on the same
+synthetic workloads, from a single binary expression to deeply nested ones:
+
+  - ``gpt4o``, ``gpt4.1`` and ``grokcodefast1`` expose binary
+    ``add``/``subtract``/``multiply``/``divide``, so they reduce a prebuilt
+    expression tree.
+  - ``gpt4.1.text`` and ``grokcodefast1.text`` take the expression text
+    through the shared ``expr_core`` evaluator, and ``split`` is the
+    ``a op b`` ``str.split()`` parsing they used before (binary only).
+  - ``gpt5mini`` takes the expression text: uncached (``parse``), through
+    the expression cache (``evaluate``), or precompiled with and without
+    constant folding (``folded`` / ``closure``), and with the ``decimal`` and
+    ``fraction`` numeric backends (no folding, so the cost of the backend's
+    arithmetic shows).
+
+Throughput (ops/sec), p50/p99 latency and peak traced memory per workload
+are printed and written to a JSON file so runs can be diffed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import importlib.util
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+ROOT = Path(__file__).resolve().parent
+
+OPS = "+-*/"
+
+
+def _load(name: str, path: str):
+    spec = importlib.util.spec_from_file_location(name, ROOT / path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# --- Workloads ---------------------------------------------------------------
+
+
+class Workload(NamedTuple):
+    name: str
+    text: str
+    tree: object
+    value: float
+
+
+def _balanced(rng: random.Random, depth: int):
+    if depth == 0:
+        return rng.randint(1, 9)
+    return (rng.choice(OPS), _balanced(rng, depth - 1), _balanced(rng, depth - 1))
+
+
+def _chain(rng: random.Random, terms: int):
+    tree = rng.randint(1, 9)
+    for _ in range(terms - 1):
+        tree = (rng.choice(OPS), tree, rng.randint(1, 9))
+    return tree
+
+
+def _nested(rng: random.Random, depth: int):
+    tree = rng.randint(1, 9)
+    for _ in range(depth):
+        tree = (rng.choice(OPS), rng.randint(1, 9), tree)
+    return tree
+
+
+def _to_text(tree, top: bool = True) -> str:
+    if type(tree) is tuple:
+        op, left, right = tree
+        text = f"{_to_text(left, False)} {op} {_to_text(right, False)}"
+        return text if top else f"({text})"
+    return str(tree)
+
+
+def _reference(tree) -> float:
+    if type(tree) is tuple:
+        op, left, right = tree
+        a, b = _reference(left), _reference(right)
+        if op == "+":
+            return a + b
+        if op == "-":
+            return a - b
+        if op == "*":
+            return a * b
+        return a / b
+    return tree
+
+
+def make_workloads(seed: int) -> list[Workload]:
+    rng = random.Random(seed)
+    shapes = [
+        ("binary", lambda: _chain(rng, 2)),
+        ("chain8", lambda: _chain(rng, 8)),
+        ("balanced_d4", lambda: _balanced(rng, 4)),
+        ("nested_d16", lambda: _nested(rng, 16)),
+        ("nested_d64", lambda: _nested(rng, 64)),
+    ]
+    workloads = []
+    for name, build in shapes:
+        while True:
+            tree = build()
+            try:
+                value = _reference(tree)
+            except ZeroDivisionError:
+                continue
+            break
+        workloads.append(Workload(name, _to_text(tree), tree, value))
+    return workloads
+
+
+# --- Engines -----------------------------------------------------------------
+
+
+class Engine(NamedTuple):
+    name: str
+    # Builds the zero-argument callable that evaluates one workload, or
+    # returns None when the engine cannot handle it.
+    prepare: Callable[[Workload], Callable[[], float] | None]
+
+
+def _tree_engine(name: str, add, subtract, multiply, divide) -> Engine:
+    ops = {"+": add, "-": subtract, "*": multiply, "/": divide}
+
+    def run(node):
+        if type(node) is tuple:
+            op, left, right = node
+            return ops[op](run(left), run(right))
+        return node
+
+    def prepare(workload: Workload):
+        tree = workload.tree
+        return lambda: run(tree)
+
+    return Engine(name, prepare)
+
+
+def _text_engine(name: str, evaluate) -> Engine:
+    def prepare(workload: Workload):
+        text = workload.text
+        return lambda: evaluate(text)
+
+    return Engine(name, prepare)
+
+
+def _split_evaluate(calc, text: str) -> float:
+    # The loop body gpt4.1 used before expr_core.
+    a, op, b = text.split()
+    a = float(a)
+    b = float(b)
+    if op == "+":
+        return calc.add(a, b)
+    elif op == "-":
+        return calc.subtract(a, b)
+    elif op == "*":
+        return calc.multiply(a, b)
+    elif op == "/":
+        return calc.divide(a, b)
+    raise ValueError(f"Unsupported operator: {op}")
+
+
+def load_engines() -> list[Engine]:
+    engines = []
+
+    gpt4o = _load("dentaku_gpt4o", "gpt4o/calculator.py").Calculator()
+    engines.append(
+        _tree_engine("gpt4o", gpt4o.add, gpt4o.subtract, gpt4o.multiply, gpt4o.divide)
+    )
+
+    gpt41 = _load("dentaku_gpt4_1", "gpt4.1/calculator.py").Calculator()
+    engines.append(
+        _tree_engine("gpt4.1", gpt41.add, gpt41.subtract, gpt41.multiply, gpt41.divide)
+    )
+
+    grok = _load("dentaku_grokcodefast1", "grokcodefast1/calculator.py")
+    engines.append(
+        _tree_engine(
+            "grokcodefast1", grok.add, grok.subtract, grok.multiply, grok.divide
+        )
+    )
+
+    def split(workload: Workload):
+        if len(workload.text.split()) != 3:
+            return None
+        text = workload.text
+        return lambda: _split_evaluate(gpt41, text)
+
+    engines.append(Engine("split", split))
+    engines.append(_text_engine("gpt4.1.text", gpt41.evaluate))
+    engines.append(_text_engine("grokcodefast1.text", grok.evaluate))
+
+    gpt5mini = _load("dentaku_gpt5mini", "gpt5mini/calculator.py")
+    gpt5mini.configure_limits(max_depth=1000)
+
+    def uncached(workload: Workload):
+        text = workload.text
+        return lambda: gpt5mini.compile(text)()
+
+    def cached(workload: Workload):
+        text = workload.text
+        return lambda: gpt5mini.evaluate(text)
+
+    def closure(workload: Workload):
+        return gpt5mini.compile(workload.text, optimize=False)
+
+    def folded(workload: Workload):
+        return gpt5mini.compile(workload.text)
+
+    def backend(name: str):
+        def prepare(workload: Workload):
+            return gpt5mini.compile(workload.text, optimize=False, backend=name)
+
+        return prepare
+
+    engines.append(Engine("gpt5mini.parse", uncached))
+    engines.append(Engine("gpt5mini.evaluate", cached))
+    engines.append(Engine("gpt5mini.closure", closure))
+    # Constant-only workloads fold to a single constant; this row shows the
+    # best case rather than the cost of the closures.
+    engines.append(Engine("gpt5mini.folded", folded))
+    engines.append(Engine("gpt5mini.decimal", backend("decimal")))
+    engines.append(Engine("gpt5mini.fraction", backend("fraction")))
+    return engines
+
+
+# --- Measurement -------------------------------------------------------------
+
+
+def measure(fn: Callable[[], float], number: int, samples: int) -> dict:
+    for _ in range(min(number, 100)):
+        fn()
+
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    elapsed = time.perf_counter() - start
+
+    clock = time.perf_counter_ns
+    latencies = []
+    for _ in range(samples):
+        t0 = clock()
+        fn()
+        latencies.append(clock() - t0)
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "ops_per_sec": number / elapsed,
+        "p50_ns": quantiles[49],
+        "p99_ns": quantiles[98],
+        "peak_bytes": peak,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="dentaku calculator benchmark")
+    parser.add_argument("-n", "--number", type=int, default=10000)
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "-o", "--output", default="bench_results.json", help="JSON result file"
+    )
+    parser.add_argument(
+        "-k", "--engine", action="append", help="Only run engines containing this"
+    )
+    args = parser.parse_args(argv)
+
+    workloads = make_workloads(args.seed)
+    engines = load_engines()
+    if args.engine:
+        engines = [e for e in engines if any(k in e.name for k in args.engine)]
+
+    results = []
+    print(
+        f"{'engine':<20} {'workload':<12} {'ops/sec':>12} "
+        f"{'p50 us':>9} {'p99 us':>9} {'peak KiB':>9}"
+    )
+    for engine in engines:
+        for workload in workloads:
+            fn = engine.prepare(workload)
+            if fn is None:
+                continue
+            value = float(fn())
+            if abs(value - workload.value) > 1e-9 * max(1.0, abs(workload.value)):
+                raise SystemExit(
+                    f"{engine.name} returned {value} for {workload.name},"
+                    f" expected {workload.value}"
+                )
+            stats = measure(fn, args.number, args.samples)
+            results.append({"engine": engine.name, "workload": workload.name, **stats})
+            print(
+                f"{engine.name:<20} {workload.name:<12} {stats['ops_per_sec']:>12,.0f} "
+                f"{stats['p50_ns'] / 1000:>9.2f} {stats['p99_ns'] / 1000:>9.2f} "
+                f"{stats['peak_bytes'] / 1024:>9.1f}"
+            )
+
+    report = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "number": args.number,
+        "samples": args.samples,
+        "workloads": {w.name: w.text for w in workloads},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
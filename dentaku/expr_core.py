@@ -0,0 +1,185 @@
+"""Shared tokenizer and precedence-climbing evaluator for dentaku calculators.
+
+Usage:
+  - ``make_evaluator({"+": add, "-": sub})("1 + 2 - 3")``
+  - ``make_evaluator(OPERATORS, number=Decimal)("0.1 + 0.2")``
+
+One regex pass splits the input into tokens, which are then evaluated in a
+single loop by precedence climbing over an explicit operator stack, without
+building a tree or recursing. Binary operators are
+dispatched through a table of ``symbol -> function``, so each calculator
+plugs in its own functions (and its own division-by-zero behavior), and
+symbols missing from the table are rejected.
+"""
+
+from __future__ import annotations
+
+import operator
+import re
+from typing import Callable, Mapping
+
+# Numbers, the two-character operators, then any other non-space character
+# so that nothing in the input is skipped silently. Malformed numbers such as
+# "1.2.3" are left for the ``number`` conversion to reject.
+_NUMBER = re.compile(r"[\d.]+(?:[eE][-+]?\d+)?")
+_TOKEN = re.compile(_NUMBER.pattern + r"|\*\*|//|\S")
+
+# symbol -> (precedence, right associative)
+_BINARY = {
+    "+": (1, False),
+    "-": (1, False),
+    "*": (2, False),
+    "/": (2, False),
+    "//": (2, False),
+    "%": (2, False),
+    "**": (4, True),
+}
+# Unary minus binds tighter than * but looser than **, as in Python:
+# -2 ** 2 == -4 and -2 * 3 == -6.
+_UNARY_PREC = 3
+
+OPERATORS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "//": operator.floordiv,
+    "%": operator.mod,
+    "**": operator.pow,
+}
+
+_NUMBER_START = frozenset("0123456789.")
+# Numerals remembered per evaluator for the "a op b" fast path.
+_NUMBER_CACHE_SIZE = 1024
+
+
+def tokenize(text: str, number: Callable[[str], object] = float) -> list:
+    """Split ``text`` into numbers (converted with ``number``) and symbols."""
+    tokens = _TOKEN.findall(text)
+    for i, token in enumerate(tokens):
+        if token[0] in _NUMBER_START:
+            try:
+                tokens[i] = number(token)
+            except (ValueError, ArithmeticError):
+                raise ValueError(f"Invalid number: {token!r}") from None
+        elif token not in _BINARY and token not in "()":
+            raise ValueError(f"Unexpected character: {token!r}")
+    return tokens
+
+
+def make_evaluator(
+    ops: Mapping[str, Callable] = OPERATORS,
+    number: Callable[[str], object] = float,
+) -> Callable[[str], object]:
+    """Return ``evaluate(text)`` for the binary operators in ``ops``.
+
+    Raises ValueError for malformed input and for operators not in ``ops``;
+    errors raised by the operator functions propagate unchanged.
+    """
+    # symbol -> (reduce threshold, stack entry). Pending operators whose
+    # precedence is >= the threshold are applied before pushing this one;
+    # right-associative operators use prec + 1 so equal ones stay pending.
+    table = {}
+    binary = dict(ops)
+    for symbol, fn in binary.items():
+        if symbol not in _BINARY:
+            raise ValueError(f"Unknown operator symbol: {symbol!r}")
+        prec, right = _BINARY[symbol]
+        table[symbol] = (prec + 1 if right else prec, (prec, fn))
+
+    bottom = (-1, None)
+    lparen = (0, None)
+    neg = (_UNARY_PREC, None)
+
+    # numeral -> number(numeral), for numerals the tokenizer would accept.
+    # Repeated operands skip both the validation and the conversion.
+    numbers = {}
+    cached_number = numbers.get
+
+    def convert(token: str):
+        if not (token.isdecimal() or _NUMBER.fullmatch(token)):
+            return None
+        try:
+            value = number(token)
+        except (ValueError, ArithmeticError):
+            return None
+        if len(numbers) >= _NUMBER_CACHE_SIZE:
+            numbers.clear()
+        numbers[token] = value
+        return value
+
+    def evaluate(text: str):
+        # Fast path for the common "a op b" written with spaces. Anything it
+        # does not accept (signs, "inf", "1_0", malformed numbers) goes
+        # through the tokenizer, which reports the error.
+        parts = text.split()
+        if len(parts) == 3:
+            a, op, b = parts
+            fn = binary.get(op)
+            if fn is not None:
+                x = cached_number(a)
+                if x is None:
+                    x = convert(a)
+                y = cached_number(b)
+                if y is None:
+                    y = convert(b)
+                if x is not None and y is not None:
+                    return fn(x, y)
+
+        values = []
+        stack = [bottom]
+        expect_operand = True
+        for token in tokenize(text, number):
+            if expect_operand:
+                if type(token) is not str:
+                    values.append(token)
+                    expect_operand = False
+                elif token == "(":
+                    stack.append(lparen)
+                elif token == "-":
+                    stack.append(neg)
+                elif token != "+":
+                    raise ValueError(f"Unexpected token: {token!r}")
+                continue
+            if type(token) is not str:
+                raise ValueError(f"Unexpected number: {token!r}")
+            entry = table.get(token)
+            if entry is not None:
+                threshold, pending = entry
+                while stack[-1][0] >= threshold:
+                    _reduce(stack, values)
+                stack.append(pending)
+                expect_operand = True
+            elif token == ")":
+                while stack[-1] is not lparen:
+                    if stack[-1] is bottom:
+                        raise ValueError("Unexpected token: ')'")
+                    _reduce(stack, values)
+                stack.pop()
+            elif token in _BINARY:
+                raise ValueError(f"Unsupported operator: {token}")
+            else:
+                raise ValueError(f"Unexpected token: {token!r}")
+        if expect_operand:
+            raise ValueError(
+                "Empty expression" if not values else "Unexpected end of expression"
+            )
+        while stack[-1] is not bottom:
+            if stack[-1] is lparen:
+                raise ValueError("Missing closing parenthesis")
+            _reduce(stack, values)
+        return values[0]
+
+    return evaluate
+
+
+def _reduce(stack: list, values: list) -> None:
+    fn = stack.pop()[1]
+    if fn is None:
+        values[-1] = -values[-1]
+    else:
+        b = values.pop()
+        values[-1] = fn(values[-1], b)
+
+
+evaluate = make_evaluator()
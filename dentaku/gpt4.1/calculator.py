@@ -1,4 +1,24 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from expr_core import make_evaluator  # noqa: E402
+
+
 class Calculator:
+    def __init__(self, number=float):
+        # 式の演算子は Calculator のメソッドに振り分ける
+        self.evaluate = make_evaluator(
+            {
+                "+": self.add,
+                "-": self.subtract,
+                "*": self.multiply,
+                "/": self.divide,
+            },
+            number,
+        )
+
     def add(self, a, b):
         return a + b
 
@@ -19,28 +39,11 @@ if __name__ == "__main__":
     print("電卓を起動しました。")
     while True:
         try:
-            expr = input("式を入力してください (例: 2 + 3)、終了は 'exit': ")
+            expr = input("式を入力してください (例: (2 + 3) * 4)、終了は 'exit': ")
             if expr.strip().lower() == "exit":
                 print("終了します。")
                 break
-            parts = expr.split()
-            if len(parts) != 3:
-                print("式は 'a 演算子 b' の形式で入力してください。")
-                continue
-            a, op, b = parts
-            a = float(a)
-            b = float(b)
-            if op == "+":
-                result = calc.add(a, b)
-            elif op == "-":
-                result = calc.subtract(a, b)
-            elif op == "*":
-                result = calc.multiply(a, b)
-            elif op == "/":
-                result = calc.divide(a, b)
-            else:
-                print("対応していない演算子です。使える演算子: + - * /")
-                continue
+            result = calc.evaluate(expr)
             print(f"結果: {result}")
         except Exception as e:
             print(f"エラー: {e}")
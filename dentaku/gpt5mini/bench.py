@@ -0,0 +1,157 @@
+"""Micro benchmark for the gpt5mini calculator engine.
+
+Usage:
+  - ``python3 bench.py``
+  - ``python3 bench.py -n 50000``
+
+Compares the original ``ast.NodeVisitor`` tree walker (kept here as the
+baseline) with ``evaluate()`` and with calling a precompiled expression
+(compiled without constant folding, so the closures are what is timed).
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import operator
+import timeit
+
+from calculator import compile, evaluate, evaluate_batch, np
+
+EXPRESSIONS = [
+    "1 + 2",
+    "2*(3+4)",
+    "(1.5 + 2.5) * 3 - 4 / 2 ** 2",
+    "-(((1 + 2) * (3 + 4)) // ((5 - 6) % 7 + 8)) + 9 ** 2 / 10",
+]
+
+
+class _TreeWalker(ast.NodeVisitor):
+    """The per-call tree walker ``evaluate()`` used before ``compile()``."""
+
+    def __init__(self):
+        self._ops = {
+            ast.Add: operator.add,
+            ast.Sub: operator.sub,
+            ast.Mult: operator.mul,
+            ast.Div: operator.truediv,
+            ast.Mod: operator.mod,
+            ast.FloorDiv: operator.floordiv,
+            ast.Pow: operator.pow,
+        }
+
+    def visit(self, node):
+        method = "visit_" + node.__class__.__name__
+        visitor = getattr(self, method, None)
+        if visitor is None:
+            raise ValueError(f"Unsupported expression: {node.__class__.__name__}")
+        return visitor(node)
+
+    def visit_Expression(self, node: ast.Expression):
+        return self.visit(node.body)
+
+    def visit_BinOp(self, node: ast.BinOp):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        return self._ops[type(node.op)](left, right)
+
+    def visit_UnaryOp(self, node: ast.UnaryOp):
+        operand = self.visit(node.operand)
+        return +operand if isinstance(node.op, ast.UAdd) else -operand
+
+    def visit_Constant(self, node: ast.Constant):
+        return node.value
+
+
+def legacy_evaluate(expr: str) -> float:
+    return _TreeWalker().visit(ast.parse(expr, mode="eval"))
+
+
+FORMULA = "price * qty * (1 - discount)"
+BINDINGS = {"price": 19.99, "qty": 3, "discount": 0.15}
+
+
+def _rate(fn, number: int) -> float:
+    best = min(timeit.repeat(fn, number=number, repeat=3))
+    return number / best
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="gpt5mini calculator benchmark")
+    parser.add_argument("-n", "--number", type=int, default=20000)
+    parser.add_argument("--rows", type=int, default=100000, help="Batch size")
+    args = parser.parse_args(argv)
+
+    print(f"{'expression':<58} {'case':<16} {'ops/sec':>12} {'speedup':>8}")
+    for expr in EXPRESSIONS:
+        assert legacy_evaluate(expr) == evaluate(expr)
+        tree = ast.parse(expr, mode="eval")
+        # Every expression here is constant and would fold to one literal;
+        # compare the closures themselves against the tree walk.
+        compiled = compile(expr, optimize=False)
+        cases = [
+            ("legacy walk", lambda: _TreeWalker().visit(tree)),
+            ("compiled call", compiled),
+            ("legacy evaluate", lambda: legacy_evaluate(expr)),
+            ("evaluate", lambda: evaluate(expr)),
+        ]
+        rates = {name: _rate(fn, args.number) for name, fn in cases}
+        baselines = {
+            "legacy walk": "legacy walk",
+            "compiled call": "legacy walk",
+            "legacy evaluate": "legacy evaluate",
+            "evaluate": "legacy evaluate",
+        }
+        for name, rate in rates.items():
+            speedup = rate / rates[baselines[name]]
+            print(f"{expr:<58} {name:<16} {rate:>12,.0f} {speedup:>7.2f}x")
+
+    # Parameterized formula: string-formatting values into the expression and
+    # re-parsing per row, versus binding them to a precompiled expression.
+    formula = compile(FORMULA)
+    template = FORMULA.replace("price", "{price}")
+    template = template.replace("qty", "{qty}").replace("discount", "{discount}")
+    cases = [
+        ("format+legacy", lambda: legacy_evaluate(template.format(**BINDINGS))),
+        ("compiled bind", lambda: formula(**BINDINGS)),
+    ]
+    rates = {name: _rate(fn, args.number) for name, fn in cases}
+    for name, rate in rates.items():
+        speedup = rate / rates["format+legacy"]
+        print(f"{FORMULA:<58} {name:<16} {rate:>12,.0f} {speedup:>7.2f}x")
+
+    # Int columns that overflow int64 take the scalar path; the results must
+    # still be the exact Python ints a per-row call gives.
+    for expr, overflow in [
+        ("x * y", {"x": [2**31, 3], "y": [2**32 + 1, 5]}),
+        ("x ** y", {"x": [2, 2], "y": [62, 63]}),
+    ]:
+        per_row = [evaluate(expr, x=x, y=y) for x, y in zip(*overflow.values())]
+        batched = evaluate_batch(expr, **overflow)
+        assert list(batched) == per_row, (expr, batched, per_row)
+        assert all(type(r) is int for r in batched), (expr, batched)
+
+    # Column batch: one call per row versus one batch() call per column set.
+    columns = {
+        name: [value + i % 7 for i in range(args.rows)]
+        for name, value in BINDINGS.items()
+    }
+    rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    if np is not None:
+        columns = {name: np.asarray(col) for name, col in columns.items()}
+    cases = [
+        ("per-row call", lambda: [formula(**row) for row in rows]),
+        ("batch", lambda: formula.batch(**columns)),
+    ]
+    rates = {
+        name: args.rows / min(timeit.repeat(fn, number=1, repeat=3))
+        for name, fn in cases
+    }
+    for name, rate in rates.items():
+        speedup = rate / rates["per-row call"]
+        print(f"{FORMULA:<58} {name:<16} {rate:>12,.0f} {speedup:>7.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
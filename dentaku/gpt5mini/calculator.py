@@ -2,30 +2,282 @@
 
 Usage:
   - Evaluate expression: `python3 calculator.py -e "2*(3+4)"`
+  - Bind variables: `python3 calculator.py -e "price * qty" -v price=10 -v qty=3`
+  - Show the optimized expression: `python3 calculator.py --debug -e "x*(60*60)" -v x=2`
+  - Exact arithmetic: `python3 calculator.py --numeric decimal -e "0.1 + 0.2"`
   - Start interactive REPL: `python3 calculator.py` or `python3 calculator.py --repl`
+  - Evaluate one expression per line: `python3 calculator.py --batch exprs.txt`
+    (or `--batch` / `--batch -` to read stdin); add `--jobs N` to spread large
+    inputs over N processes
 
 Supports +, -, *, /, %, //, ** and unary +/-. Uses ast to safely evaluate.
+
+Library use:
+  - ``evaluate("2*(3+4)")`` parses and evaluates in one step.
+  - ``compile("2*(3+4)")`` validates once and returns a callable that can be
+    invoked repeatedly without re-parsing.
+  - Names are variables bound at call time:
+    ``compile("price * qty")(price=10, qty=3)``.
+  - ``evaluate_batch("price * qty", price=[...], qty=[...])`` evaluates
+    whole columns at once, as NumPy ufuncs when NumPy is installed.
+  - ``evaluate()`` memoizes compiled expressions in a bounded LRU cache; see
+    ``configure_cache()`` and ``cache_info()``.
+  - ``compile()`` folds constant subexpressions and drops identity
+    operations first; ``CompiledExpression.optimized`` shows the result.
+  - Numbers are Python int/float by default; ``configure_backend("decimal")``
+    or ``compile(expr, backend="fraction")`` switch to exact arithmetic.
 """
 
 from __future__ import annotations
 
 import ast
+import copy
+import decimal
+import itertools
 import operator
+import os
 import argparse
 import sys
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from fractions import Fraction
+from typing import Callable, Iterable, NamedTuple, TextIO
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
 
-class _Evaluator(ast.NodeVisitor):
-    def __init__(self):
-        self._ops = {
-            ast.Add: operator.add,
-            ast.Sub: operator.sub,
-            ast.Mult: operator.mul,
-            ast.Div: operator.truediv,
-            ast.Mod: operator.mod,
-            ast.FloorDiv: operator.floordiv,
-            ast.Pow: operator.pow,
-        }
+
+class LimitError(ValueError):
+    """An expression exceeds one of the configured resource limits."""
+
+
+class Limits(NamedTuple):
+    """Resource limits applied to every compiled expression.
+
+    ``max_exponent`` and ``max_bits`` bound exact powers (``int ** int``,
+    and ``Fraction`` powers with the fraction backend), the operation whose
+    result can grow much faster than its operands; they are checked before
+    the power is computed. ``max_bits`` also bounds exact products, so a
+    chain of large factors cannot grow without limit. ``max_length`` bounds
+    the source text and is checked before parsing; ``max_nodes`` and
+    ``max_depth`` bound the expression tree and are checked right after.
+    """
+
+    max_exponent: int = 100_000
+    max_bits: int = 1_000_000
+    max_nodes: int = 10_000
+    max_depth: int = 200
+    max_length: int = 100_000
+
+
+_limits = Limits()
+
+_EXACT_TYPES = (int, Fraction)
+
+
+def _exact_bits(value) -> int:
+    return max(value.numerator.bit_length(), value.denominator.bit_length())
+
+
+def _pow_bits(base, exponent) -> int | None:
+    """Estimated bit length of an exact power, or None if it is not exact."""
+    if (
+        isinstance(base, _EXACT_TYPES)
+        and isinstance(exponent, _EXACT_TYPES)
+        and exponent.denominator == 1
+    ):
+        # int ** -n gives a float, but a negative power involving a
+        # Fraction is exact and as large as the positive one.
+        if exponent < 0 and not isinstance(base, Fraction):
+            if not isinstance(exponent, Fraction):
+                return None
+        return _exact_bits(base) * abs(int(exponent))
+    return None
+
+
+def _check_pow(limits: Limits, base, exponent) -> None:
+    bits = _pow_bits(base, exponent)
+    if bits is None:
+        return
+    if abs(exponent) > limits.max_exponent:
+        raise LimitError(
+            f"Exponent {exponent} exceeds the limit of {limits.max_exponent}"
+        )
+    if bits > limits.max_bits:
+        raise LimitError(
+            f"Result of {base} ** {exponent} would need about {bits} bits"
+            f" (limit {limits.max_bits})"
+        )
+
+
+def _check_mul(limits: Limits, a, b) -> None:
+    # The product of exact numbers needs at most the sum of their sizes.
+    if isinstance(a, _EXACT_TYPES) and isinstance(b, _EXACT_TYPES):
+        bits = _exact_bits(a) + _exact_bits(b)
+        if bits > limits.max_bits:
+            raise LimitError(
+                f"Product would need about {bits} bits (limit {limits.max_bits})"
+            )
+
+
+class Backend(NamedTuple):
+    """The number type used for literals, bound variables and arithmetic.
+
+    ``ops`` maps AST operator types to functions. ``convert`` turns literal
+    source text and bound values into the backend's numbers; it is None for
+    the float backend, which uses Python numbers as they are. The backend is
+    fixed when an expression is compiled, so the compiled closures call the
+    backend's functions directly instead of checking types per operation.
+    """
+
+    name: str
+    ops: dict
+    convert: Callable | None = None
+    context: decimal.Context | None = None
+
+
+_FLOAT_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.FloorDiv: operator.floordiv,
+    ast.Pow: operator.pow,
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+# Python int/float arithmetic; ints stay exact, true division gives floats.
+FLOAT = Backend("float", _FLOAT_OPS)
+
+
+def _to_fraction(value) -> Fraction:
+    # Floats go through their shortest repr, so 0.1 means 1/10.
+    if isinstance(value, float):
+        value = repr(value)
+    return Fraction(value)
+
+
+FRACTION = Backend("fraction", _FLOAT_OPS, _to_fraction)
+
+
+def decimal_backend(context: decimal.Context | None = None) -> Backend:
+    """A ``decimal.Decimal`` backend doing all arithmetic in ``context``.
+
+    Defaults to a copy of the current thread's context. Decimal rules apply:
+    ``%`` and ``//`` truncate toward zero, and errors are the context's
+    traps, raised as the float backend's exceptions: ZeroDivisionError for
+    ``decimal.DivisionByZero``, OverflowError for ``decimal.Overflow`` and
+    ValueError for other invalid operations.
+    """
+    ctx = context.copy() if context is not None else decimal.getcontext().copy()
+
+    def convert(value) -> Decimal:
+        if isinstance(value, float):
+            value = repr(value)
+        return ctx.create_decimal(value)
+
+    def remainder(a, b) -> Decimal:
+        # Decimal signals InvalidOperation here, not DivisionByZero.
+        if not b:
+            raise ZeroDivisionError("modulo by zero")
+        return ctx.remainder(a, b)
+
+    ops = {
+        ast.Add: ctx.add,
+        ast.Sub: ctx.subtract,
+        ast.Mult: ctx.multiply,
+        ast.Div: ctx.divide,
+        ast.Mod: remainder,
+        ast.FloorDiv: ctx.divide_int,
+        ast.Pow: ctx.power,
+        ast.UAdd: ctx.plus,
+        ast.USub: ctx.minus,
+    }
+    return Backend("decimal", ops, convert, ctx)
+
+
+def _decimal_error(e: decimal.DecimalException) -> ArithmeticError:
+    """Translate a trapped decimal signal into the float backend's exception.
+
+    The C implementation raises with a list of signal classes as the
+    message, e.g. ``[<class 'decimal.DivisionByZero'>]``.
+    """
+    signals = e.args[0] if e.args and isinstance(e.args[0], list) else [type(e)]
+    if any(issubclass(s, ZeroDivisionError) for s in signals):
+        return ZeroDivisionError("division by zero")
+    if any(issubclass(s, decimal.Overflow) for s in signals):
+        return OverflowError("Numerical result out of range")
+    if any(issubclass(s, decimal.ConversionSyntax) for s in signals):
+        return ValueError("Invalid number")
+    return ValueError("Invalid decimal operation")
+
+
+def _decimal_errors(fn):
+    def call(env):
+        try:
+            return fn(env)
+        except decimal.DecimalException as e:
+            raise _decimal_error(e) from None
+
+    return call
+
+
+def get_backend(name: str, context: decimal.Context | None = None) -> Backend:
+    """Return the backend called ``name`` ("float", "decimal" or "fraction")."""
+    if name == "float":
+        return FLOAT
+    if name == "fraction":
+        return FRACTION
+    if name == "decimal":
+        return decimal_backend(context)
+    raise ValueError(f"Unknown numeric backend: {name}")
+
+
+_backend = FLOAT
+
+_NUMBER_TYPES = (int, float, Decimal, Fraction)
+
+
+def _check_size(tree: ast.AST, limits: Limits) -> None:
+    # Iterative so that hostile nesting cannot exhaust the Python stack.
+    nodes = 0
+    stack = [(tree, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if isinstance(node, ast.expr):
+            nodes += 1
+            depth += 1
+            if nodes > limits.max_nodes:
+                raise LimitError(f"Expression has more than {limits.max_nodes} nodes")
+            if depth > limits.max_depth:
+                raise LimitError(
+                    f"Expression is nested deeper than {limits.max_depth} levels"
+                )
+        stack.extend((child, depth) for child in ast.iter_child_nodes(node))
+
+
+class _Compiler(ast.NodeVisitor):
+    """Validate an AST once and translate it into nested closures.
+
+    Reflection-based dispatch through ``visit`` only happens at compile time;
+    the returned closures call the operator functions directly.
+    """
+
+    _ops = _FLOAT_OPS
+    _convert = None
+
+    def __init__(self, limits: Limits | None = None, backend: Backend | None = None):
+        self.names: set[str] = set()
+        self._limits = limits
+        if backend is not None:
+            self._ops = backend.ops
+            self._convert = backend.convert
 
     def visit(self, node):
         method = "visit_" + node.__class__.__name__
@@ -38,45 +290,724 @@ class _Evaluator(ast.NodeVisitor):
         return self.visit(node.body)
 
     def visit_BinOp(self, node: ast.BinOp):
+        op_type = type(node.op)
+        if op_type not in self._ops or op_type in (ast.UAdd, ast.USub):
+            raise ValueError(f"Unsupported operator: {op_type.__name__}")
+        op = self._ops[op_type]
         left = self.visit(node.left)
         right = self.visit(node.right)
+        limits = self._limits
+        if limits is None or op_type not in (ast.Mult, ast.Pow):
+            return lambda env: op(left(env), right(env))
+
+        # The checks are inlined so that float operands, and products of
+        # ordinary ints, cost no extra call.
+        max_bits = limits.max_bits
+        if op_type is ast.Pow:
+            max_exponent = limits.max_exponent
+
+            def checked(env):
+                a = left(env)
+                b = right(env)
+                if type(a) is int and type(b) is int:
+                    if b > max_exponent or a.bit_length() * b > max_bits:
+                        _check_pow(limits, a, b)
+                elif isinstance(a, _EXACT_TYPES) and isinstance(b, _EXACT_TYPES):
+                    _check_pow(limits, a, b)
+                return op(a, b)
+
+        else:
+
+            def checked(env):
+                a = left(env)
+                b = right(env)
+                if type(a) is int and type(b) is int:
+                    if a.bit_length() + b.bit_length() > max_bits:
+                        _check_mul(limits, a, b)
+                elif isinstance(a, _EXACT_TYPES) and isinstance(b, _EXACT_TYPES):
+                    _check_mul(limits, a, b)
+                return op(a, b)
+
+        return checked
+
+    def visit_UnaryOp(self, node: ast.UnaryOp):
+        operand = self.visit(node.operand)
+        op_type = type(node.op)
+        if op_type not in (ast.UAdd, ast.USub):
+            raise ValueError(f"Unsupported unary operator: {op_type.__name__}")
+        op = self._ops[op_type]
+        return lambda env: op(operand(env))
+
+    def visit_Constant(self, node: ast.Constant):
+        if isinstance(node.value, _NUMBER_TYPES):
+            value = node.value
+            return lambda env: value
+        raise ValueError("Only int/float constants are allowed")
+
+    def visit_Name(self, node: ast.Name):
+        name = node.id
+        self.names.add(name)
+        convert = self._convert
+
+        if convert is None:
+
+            def load(env):
+                try:
+                    value = env[name]
+                except KeyError:
+                    raise ValueError(f"Undefined variable: {name}") from None
+                if not isinstance(value, _NUMBER_TYPES):
+                    raise ValueError(f"Variable {name} must be a number")
+                if value.__class__ is bool:
+                    # As an int, so ``x * 1`` gives 1 whether or not the
+                    # identity was dropped.
+                    return int(value)
+                return value
+
+        else:
+
+            def load(env):
+                try:
+                    value = env[name]
+                except KeyError:
+                    raise ValueError(f"Undefined variable: {name}") from None
+                return convert(value)
+
+        return load
+
+    # For Python <3.8 compatibility
+    def visit_Num(self, node: ast.Num):
+        value = node.n
+        return lambda env: value
+
+
+def _is_number(node: ast.AST) -> bool:
+    return isinstance(node, ast.Constant) and isinstance(node.value, _NUMBER_TYPES)
+
+
+class _Literals(ast.NodeTransformer):
+    """Convert numeric literals to the backend's type from their source text.
+
+    Working from the text keeps ``0.1`` exact for the decimal and fraction
+    backends instead of inheriting the binary float's rounding error.
+    """
+
+    def __init__(self, source: str, convert: Callable):
+        self._source = source
+        self._convert = convert
+
+    def visit_Constant(self, node: ast.Constant):
+        if not isinstance(node.value, (int, float)):
+            return node
+        text = ast.get_source_segment(self._source, node)
+        try:
+            value = self._convert(text)
+        except (TypeError, ValueError, ArithmeticError):
+            # Literals such as 0x1f are not valid Decimal/Fraction text.
+            value = self._convert(node.value)
+        return ast.copy_location(ast.Constant(value), node)
+
+
+def _is_int(node: ast.AST, value: int) -> bool:
+    # Only int identities are dropped: ``x * 1.0`` turns an int x into a
+    # float, so it is not an identity. Bound bools are loaded as ints, so
+    # the one remaining difference is IEEE negative zero: ``x + 0`` with
+    # x = -0.0 gives -0.0 once the ``+ 0`` is dropped, not 0.0.
+    return (
+        isinstance(node, ast.Constant)
+        and type(node.value) is int
+        and node.value == value
+    )
+
+
+class _Optimizer(ast.NodeTransformer):
+    """Fold constant subtrees and drop identity operations.
+
+    Runs between ``ast.parse`` and compilation. A constant subtree that
+    would raise on every call (``1/0``, ``10.0**400``, ``9**9**9`` over the
+    limits) raises the same exception here, at compile time.
+    """
+
+    # int ** int is folded only while the result stays below this many bits;
+    # larger powers within the limits are left for run time.
+    _MAX_FOLD_POW_BITS = 4096
+
+    def __init__(self, limits: Limits, ops: dict):
+        self._limits = limits
+        self._ops = ops
+
+    def visit_BinOp(self, node: ast.BinOp):
+        self.generic_visit(node)
+        left, right = node.left, node.right
+        op = self._ops.get(type(node.op))
+        if op is None:
+            return node
+        if _is_number(left) and _is_number(right):
+            if isinstance(node.op, ast.Pow):
+                _check_pow(self._limits, left.value, right.value)
+                if not self._cheap_pow(left.value, right.value):
+                    return node
+            elif isinstance(node.op, ast.Mult):
+                _check_mul(self._limits, left.value, right.value)
+            value = op(left.value, right.value)
+            if not isinstance(value, _NUMBER_TYPES):
+                # e.g. (-8) ** 0.5 is complex; keep it for run time.
+                return node
+            return ast.copy_location(ast.Constant(value), node)
+        if isinstance(node.op, (ast.Add, ast.Sub)) and _is_int(right, 0):
+            return left
+        if isinstance(node.op, ast.Add) and _is_int(left, 0):
+            return right
+        if isinstance(node.op, (ast.Mult, ast.Pow)) and _is_int(right, 1):
+            return left
+        if isinstance(node.op, ast.Mult) and _is_int(left, 1):
+            return right
+        return node
+
+    def visit_UnaryOp(self, node: ast.UnaryOp):
+        self.generic_visit(node)
+        operand = node.operand
+        if isinstance(node.op, ast.UAdd):
+            if _is_number(operand) or isinstance(operand, ast.UnaryOp):
+                return operand
+        elif isinstance(node.op, ast.USub):
+            if _is_number(operand):
+                value = self._ops[ast.USub](operand.value)
+                return ast.copy_location(ast.Constant(value), node)
+            if isinstance(operand, ast.UnaryOp) and isinstance(operand.op, ast.USub):
+                return operand.operand
+        return node
+
+    def _cheap_pow(self, base, exponent) -> bool:
+        bits = _pow_bits(base, exponent)
+        return bits is None or bits <= self._MAX_FOLD_POW_BITS
+
+
+class _DisplayConstants(ast.NodeTransformer):
+    # ast.unparse prints Constant(-8) ** 0.5 as "-8 ** 0.5" and Decimal or
+    # Fraction constants through repr(); rewrite constants for display only.
+    def visit_Constant(self, node: ast.Constant):
+        value = node.value
+        if isinstance(value, (int, float)):
+            if value < 0:
+                return ast.UnaryOp(ast.USub(), ast.Constant(-value))
+            return node
+        if isinstance(value, (Decimal, Fraction)):
+            text = str(value)
+            if value < 0 or "/" in text:
+                text = f"({text})"
+            return ast.Name(text)
+        return node
+
+
+class _Fallback(Exception):
+    """The vectorized result would differ from the scalar path."""
+
+
+# int64 results whose float64 estimate reaches this magnitude may have
+# wrapped around; Python ints would not, so such batches use the scalar path.
+_INT_LIMIT = 2.0**62
+_INT64_BOUND = 2**63
+
+
+def _vector_apply(op, *args):
+    result = op(*args)
+    if np.asarray(result).dtype.kind == "i":
+        estimate = op(*(np.asarray(a, dtype=np.float64) for a in args))
+        if not np.all(np.abs(estimate) < _INT_LIMIT):
+            raise _Fallback
+    return result
+
+
+def _vector_pow(base, exponent):
+    exponent_arr = np.asarray(exponent)
+    if exponent_arr.dtype.kind == "i" and np.any(exponent_arr < 0):
+        # Python gives a float for int ** -n; NumPy refuses.
+        raise _Fallback
+    return _vector_apply(np.power, base, exponent)
+
+
+class _VectorCompiler(_Compiler):
+    """Compile to NumPy ufunc calls that operate on whole columns at once.
+
+    Closures must run under ``np.errstate(all="raise")``; any floating point
+    signal, integer overflow or dtype mismatch raises ``_Fallback`` or
+    ``FloatingPointError`` so the caller can re-run the batch on the scalar
+    path and get exactly its results and errors.
+    """
+
+    if np is not None:
+        _ops = {
+            ast.Add: np.add,
+            ast.Sub: np.subtract,
+            ast.Mult: np.multiply,
+            ast.Div: np.true_divide,
+            ast.Mod: np.remainder,
+            ast.FloorDiv: np.floor_divide,
+            ast.Pow: _vector_pow,
+        }
+
+    def visit_BinOp(self, node: ast.BinOp):
         op_type = type(node.op)
         if op_type not in self._ops:
             raise ValueError(f"Unsupported operator: {op_type.__name__}")
-        return self._ops[op_type](left, right)
+        op = self._ops[op_type]
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        if op is _vector_pow:
+            return lambda env: op(left(env), right(env))
+        return lambda env: _vector_apply(op, left(env), right(env))
 
     def visit_UnaryOp(self, node: ast.UnaryOp):
         operand = self.visit(node.operand)
         if isinstance(node.op, ast.UAdd):
-            return +operand
+            return lambda env: np.positive(operand(env))
         if isinstance(node.op, ast.USub):
-            return -operand
+            return lambda env: _vector_apply(np.negative, operand(env))
         raise ValueError(f"Unsupported unary operator: {node.op.__class__.__name__}")
 
-    def visit_Constant(self, node: ast.Constant):
-        if isinstance(node.value, (int, float)):
-            return node.value
-        raise ValueError("Only int/float constants are allowed")
+    def visit_Name(self, node: ast.Name):
+        # Columns were already checked by _as_column.
+        name = node.id
+        self.names.add(name)
 
-    # For Python <3.8 compatibility
-    def visit_Num(self, node: ast.Num):
-        return node.n
+        def load(env):
+            try:
+                return env[name]
+            except KeyError:
+                raise ValueError(f"Undefined variable: {name}") from None
 
+        return load
 
-def evaluate(expr: str) -> float:
-    """Safely evaluate a numeric expression and return result.
 
-    Raises ValueError for unsupported constructs or malformed expressions.
+def _as_column(value):
+    arr = np.asarray(value)
+    kind = arr.dtype.kind
+    if kind == "f":
+        return arr.astype(np.float64, copy=False)
+    if kind == "i":
+        return arr.astype(np.int64, copy=False)
+    if kind == "b":
+        # NumPy treats bool + bool as logical or; Python treats them as ints.
+        return arr.astype(np.int64)
+    raise _Fallback
+
+
+def _scalar_rows(columns):
+    """Yield one binding dict per row for the pure-Python batch path."""
+    fixed = {}
+    sequences = {}
+    for name, column in columns.items():
+        try:
+            sequences[name] = list(column)
+        except TypeError:
+            fixed[name] = column
+    lengths = {len(seq) for seq in sequences.values()}
+    if len(lengths) > 1:
+        raise ValueError("Batch columns must have equal lengths")
+    count = lengths.pop() if lengths else 1
+    for i in range(count):
+        row = dict(fixed)
+        for name, seq in sequences.items():
+            row[name] = seq[i]
+        yield row
+
+
+def _result_array(results: list):
+    # np.array() would turn ints past int64, or ints mixed with floats, into
+    # float64; an object array keeps each row's result exactly.
+    types = set(map(type, results))
+    if int in types and (
+        len(types) > 1 or not all(-_INT64_BOUND <= r < _INT64_BOUND for r in results)
+    ):
+        return np.array(results, dtype=object)
+    return np.array(results)
+
+
+class CompiledExpression:
+    """A validated expression that can be evaluated repeatedly.
+
+    Variables are bound per call by keyword, e.g. ``f(price=10, qty=3)``;
+    ``names`` lists the variables the expression refers to.
     """
+
+    __slots__ = ("source", "names", "backend", "_fn", "_tree", "_vector_fn")
+
+    def __init__(
+        self,
+        source: str,
+        fn,
+        names: frozenset[str] = frozenset(),
+        tree: ast.AST | None = None,
+        backend: Backend = FLOAT,
+    ):
+        self.source = source
+        self.names = names
+        self.backend = backend
+        self._fn = fn
+        self._tree = tree
+        self._vector_fn = None
+
+    def __call__(self, /, **variables: float) -> float:
+        return self._fn(variables)
+
+    def batch(self, /, **columns):
+        """Evaluate the expression over whole columns of bindings.
+
+        Columns are arrays or array-likes (scalars broadcast). With NumPy the
+        expression runs as ufuncs over the batch and a NumPy array is
+        returned; without NumPy each row goes through the scalar path and a
+        list is returned. Either way results and errors (division by zero,
+        overflow) match calling the expression once per row. Only the float
+        backend is vectorized; other backends always take the scalar path.
+        """
+        if np is None:
+            return [self._fn(row) for row in _scalar_rows(columns)]
+        if self.backend is not FLOAT:
+            return self._batch_scalar(columns)
+        try:
+            arrays = {name: _as_column(col) for name, col in columns.items()}
+            try:
+                shape = np.broadcast_shapes(*(a.shape for a in arrays.values()))
+            except ValueError:
+                raise ValueError("Batch columns cannot be broadcast together") from None
+            if self._vector_fn is None:
+                self._vector_fn = _VectorCompiler().visit(self._tree)
+            with np.errstate(all="raise"):
+                result = self._vector_fn(arrays)
+        except (_Fallback, FloatingPointError, OverflowError):
+            return self._batch_scalar(columns)
+        if np.shape(result) != shape:
+            result = np.broadcast_to(result, shape).copy()
+        return result
+
+    def _batch_scalar(self, columns):
+        arrays = [np.asarray(col) for col in columns.values()]
+        broadcast = np.broadcast_arrays(*arrays)
+        shape = broadcast[0].shape if broadcast else ()
+        rows = zip(*(arr.ravel().tolist() for arr in broadcast))
+        if not broadcast:
+            rows = [()]
+        names = list(columns)
+        results = [self._fn(dict(zip(names, row))) for row in rows]
+        return _result_array(results).reshape(shape)
+
+    @property
+    def optimized(self) -> str:
+        """The expression as it is executed, after optimization."""
+        return ast.unparse(_DisplayConstants().visit(copy.deepcopy(self._tree)))
+
+    def __repr__(self) -> str:
+        return f"CompiledExpression({self.source!r})"
+
+
+def compile(
+    expr: str,
+    optimize: bool = True,
+    limits: Limits | None = None,
+    backend: Backend | str | None = None,
+) -> CompiledExpression:
+    """Parse and validate an expression once and return a reusable callable.
+
+    With ``optimize`` (the default) constant subtrees are folded and identity
+    operations such as ``x * 1`` and ``x + 0`` are dropped before compiling.
+    ``limits`` and ``backend`` default to the ones set with
+    ``configure_limits()`` and ``configure_backend()``.
+
+    Raises ValueError for unsupported constructs or malformed expressions,
+    LimitError (a ValueError) when a resource limit is exceeded, and
+    ZeroDivisionError/OverflowError for constant subexpressions that would
+    fail on every evaluation.
+    """
+    limits = limits or _limits
+    if backend is None:
+        backend = _backend
+    elif isinstance(backend, str):
+        backend = get_backend(backend)
+    if len(expr) > limits.max_length:
+        raise LimitError(f"Expression is longer than {limits.max_length} characters")
     try:
         tree = ast.parse(expr, mode="eval")
     except SyntaxError as e:
         raise ValueError(f"Syntax error in expression: {e}")
-    evaluator = _Evaluator()
-    return evaluator.visit(tree)
+    except (RecursionError, MemoryError):
+        raise LimitError("Expression is too deeply nested to parse") from None
+    _check_size(tree, limits)
+    if backend.convert is not None:
+        tree = _Literals(expr, backend.convert).visit(tree)
+    compiler = _Compiler(limits, backend)
+    if optimize:
+        try:
+            tree = _Optimizer(limits, compiler._ops).visit(tree)
+        except decimal.DecimalException as e:
+            raise _decimal_error(e) from None
+    fn = compiler.visit(tree)
+    if backend.context is not None:
+        fn = _decimal_errors(fn)
+    names = frozenset(compiler.names)
+    return CompiledExpression(expr, fn, names, tree, backend)
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    maxsize: int
+
+
+def _normalize(expr: str) -> str:
+    # Trim and collapse whitespace runs so " 1 +  2" and "1 + 2" share a
+    # slot, without merging tokens ("1 2" must stay a syntax error).
+    return " ".join(expr.split())
+
+
+class ExpressionCache:
+    """Size-bounded LRU cache of compiled expressions.
+
+    Keys are the whitespace-normalized expression text. A ``maxsize`` of 0
+    disables caching; every lookup then compiles afresh and counts as a miss.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, CompiledExpression] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, expr: str) -> CompiledExpression:
+        key = _normalize(expr)
+        with self._lock:
+            compiled = self._data.get(key)
+            if compiled is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+        # Compile outside the lock; errors propagate and are not cached.
+        compiled = compile(key)
+        if self.maxsize:
+            with self._lock:
+                self._data[key] = compiled
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+        return compiled
+
+    def resize(self, maxsize: int) -> None:
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(
+                self.hits, self.misses, self.evictions, len(self._data), self.maxsize
+            )
 
 
-def repl():
+_cache = ExpressionCache()
+
+
+def configure_cache(maxsize: int) -> None:
+    """Set the size of the shared expression cache (0 disables it)."""
+    _cache.resize(maxsize)
+
+
+def configure_limits(**limits: int) -> Limits:
+    """Change the default resource limits, e.g. ``configure_limits(max_depth=50)``.
+
+    Cached expressions were compiled under the old limits, so the cache is
+    cleared. Returns the new limits.
+    """
+    global _limits
+    _limits = _limits._replace(**limits)
+    _cache.clear()
+    return _limits
+
+
+def configure_backend(
+    backend: Backend | str, context: decimal.Context | None = None
+) -> Backend:
+    """Change the default numeric backend, e.g. ``configure_backend("decimal")``.
+
+    ``context`` configures the decimal backend when given by name. Cached
+    expressions were compiled for the old backend, so the cache is cleared.
+    Returns the new backend.
+    """
+    global _backend
+    if isinstance(backend, str):
+        backend = get_backend(backend, context)
+    _backend = backend
+    _cache.clear()
+    return _backend
+
+
+def cache_info() -> CacheInfo:
+    """Return hit/miss/eviction counters of the shared expression cache."""
+    return _cache.info()
+
+
+def evaluate(expr: str, /, **variables: float) -> float:
+    """Safely evaluate a numeric expression and return result.
+
+    Names in the expression are looked up in ``variables``.
+
+    Compiled expressions are memoized in a shared LRU cache, so repeated
+    expressions skip parsing and validation.
+
+    Raises ValueError for unsupported constructs or malformed expressions.
+    """
+    return _cache.get(expr)(**variables)
+
+
+def evaluate_batch(expr: str, /, **columns):
+    """Evaluate an expression over columns of variable bindings.
+
+    See ``CompiledExpression.batch``; the compiled expression is shared with
+    ``evaluate()`` through the expression cache.
+    """
+    return _cache.get(expr).batch(**columns)
+
+
+def _parse_var(text: str) -> tuple[str, str]:
+    # The value is evaluated later, once the numeric backend is configured.
+    name, sep, value = text.partition("=")
+    name = name.strip()
+    if not sep or not name.isidentifier():
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {text!r}")
+    return name, value
+
+
+# Lines of output collected before each write in batch mode.
+_BATCH_WRITE_LINES = 4096
+# Inputs shorter than this run serially even with jobs > 1: starting the
+# worker processes costs more than it saves.
+_PARALLEL_MIN_LINES = 50_000
+# Lines per task sent to a worker process.
+_PARALLEL_CHUNK_LINES = 16_384
+
+_worker_variables: dict[str, float] = {}
+
+
+def _evaluate_lines(lines: Iterable[str], variables: dict[str, float]):
+    """Evaluate each line and return (output lines, error count).
+
+    Blank lines produce blank output so output line N always belongs to
+    input line N.
+    """
+    get = _cache.get
+    out = []
+    append = out.append
+    errors = 0
+    for line in lines:
+        expr = line.strip()
+        if not expr:
+            append("\n")
+            continue
+        try:
+            append(f"{get(expr)(**variables)}\n")
+        except Exception as e:
+            append(f"Error: {e}\n")
+            errors += 1
+    return out, errors
+
+
+def _chunks(lines: Iterable[str], size: int):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _init_worker(
+    variables: dict[str, float],
+    cache_size: int,
+    limits: Limits,
+    backend_name: str,
+    context: decimal.Context | None,
+) -> None:
+    global _worker_variables
+    _worker_variables = variables
+    configure_cache(cache_size)
+    configure_limits(**limits._asdict())
+    configure_backend(backend_name, context)
+
+
+def _evaluate_chunk(lines: list[str]) -> tuple[str, int]:
+    out, errors = _evaluate_lines(lines, _worker_variables)
+    return "".join(out), errors
+
+
+def _run_parallel(lines, out: TextIO, variables, jobs: int) -> int:
+    errors = 0
+    pending = deque()
+    # Backends hold closures, which do not pickle; workers rebuild them.
+    initargs = (variables, _cache.maxsize, _limits, _backend.name, _backend.context)
+    with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=initargs) as pool:
+        for chunk in _chunks(lines, _PARALLEL_CHUNK_LINES):
+            pending.append(pool.submit(_evaluate_chunk, chunk))
+            # Bound the chunks in flight so memory stays flat on huge
+            # inputs; results are written strictly in submission order.
+            if len(pending) >= jobs * 2:
+                text, failed = pending.popleft().result()
+                out.write(text)
+                errors += failed
+        while pending:
+            text, failed = pending.popleft().result()
+            out.write(text)
+            errors += failed
+    return errors
+
+
+def run_batch(
+    lines: Iterable[str],
+    out: TextIO,
+    variables: dict[str, float] | None = None,
+    jobs: int = 1,
+) -> int:
+    """Stream one result (or ``Error: ...``) per input line to ``out``.
+
+    Per-line errors do not stop the run. Output is written in blocks of
+    ``_BATCH_WRITE_LINES`` lines rather than flushed per line. With
+    ``jobs > 1`` inputs of at least ``_PARALLEL_MIN_LINES`` lines are split
+    into chunks and evaluated in a process pool; output order is unchanged.
+    Returns the number of lines that failed.
+    """
+    variables = variables or {}
+    if jobs > 1:
+        lines = iter(lines)
+        head = list(itertools.islice(lines, _PARALLEL_MIN_LINES))
+        lines = itertools.chain(head, lines)
+        if len(head) >= _PARALLEL_MIN_LINES:
+            return _run_parallel(lines, out, variables, jobs)
+    errors = 0
+    for chunk in _chunks(lines, _BATCH_WRITE_LINES):
+        results, failed = _evaluate_lines(chunk, variables)
+        out.write("".join(results))
+        errors += failed
+    return errors
+
+
+def repl(variables: dict[str, float] | None = None, debug: bool = False):
+    variables = variables or {}
     print("gpt5mini 電卓 REPL — 終了: exit, quit, Ctrl-D")
     while True:
         try:
@@ -89,8 +1020,10 @@ def repl():
         if line.lower() in ("exit", "quit"):
             break
         try:
-            result = evaluate(line)
-            print(result)
+            compiled = _cache.get(line)
+            if debug:
+                print(f"optimized: {compiled.optimized}", file=sys.stderr)
+            print(compiled(**variables))
         except Exception as e:
             print(f"エラー: {e}")
 
@@ -99,19 +1032,100 @@ def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(description="Safe calculator")
     parser.add_argument("-e", "--expr", help="Evaluate expression and exit")
     parser.add_argument("--repl", action="store_true", help="Start REPL")
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=_cache.maxsize,
+        help="Max compiled expressions to cache (0 disables the cache)",
+    )
+    parser.add_argument(
+        "-v",
+        "--var",
+        action="append",
+        type=_parse_var,
+        default=[],
+        metavar="NAME=VALUE",
+        help="Bind a variable (repeatable)",
+    )
+    parser.add_argument(
+        "--batch",
+        nargs="?",
+        const="-",
+        metavar="FILE",
+        help="Evaluate one expression per line from FILE or stdin ('-')",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for --batch (0 = number of CPUs)",
+    )
+    parser.add_argument(
+        "--debug",
+        action="store_true",
+        help="Print the optimized form of each expression to stderr",
+    )
+    parser.add_argument(
+        "--numeric",
+        choices=("float", "decimal", "fraction"),
+        default="float",
+        help="Numeric backend (default: float)",
+    )
+    parser.add_argument(
+        "--precision",
+        type=int,
+        help="Significant digits for --numeric decimal",
+    )
+    for field, default in Limits._field_defaults.items():
+        parser.add_argument(
+            "--" + field.replace("_", "-"),
+            type=int,
+            default=default,
+            help=f"Resource limit (default: {default})",
+        )
     args = parser.parse_args(argv)
+    configure_limits(**{field: getattr(args, field) for field in Limits._fields})
+    context = None
+    if args.precision is not None:
+        context = decimal.Context(prec=args.precision)
+    configure_backend(args.numeric, context)
+    configure_cache(args.cache_size)
+    variables = {}
+    for name, value in args.var:
+        try:
+            variables[name] = evaluate(value)
+        except Exception as e:
+            parser.error(f"invalid value for {name}: {e}")
+    jobs = args.jobs or os.cpu_count() or 1
 
     if args.expr:
         try:
-            res = evaluate(args.expr)
+            compiled = _cache.get(args.expr)
+            if args.debug:
+                print(f"optimized: {compiled.optimized}", file=sys.stderr)
+            res = compiled(**variables)
             print(res)
             return 0
         except Exception as e:
             print(f"Error: {e}", file=sys.stderr)
             return 2
 
+    if args.batch:
+        try:
+            if args.batch == "-":
+                errors = run_batch(sys.stdin, sys.stdout, variables, jobs)
+            else:
+                with open(args.batch, encoding="utf-8") as f:
+                    errors = run_batch(f, sys.stdout, variables, jobs)
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        sys.stdout.flush()
+        return 2 if errors else 0
+
     if args.repl or not args.expr:
-        repl()
+        repl(variables, args.debug)
         return 0
 
 
@@ -0,0 +1,327 @@
+"""HTTP service for the gpt5mini calculator.
+
+Usage:
+  - Start the server: ``python3 server.py serve --port 8000``
+    (or ``uvicorn server:app --port 8000``)
+  - Load test a running server:
+    ``python3 server.py load --url http://127.0.0.1:8000 -n 20000 -c 32``
+  - Load test an in-process server: ``python3 server.py load``
+
+Endpoints:
+  - ``POST /evaluate`` with ``{"expr": "price * qty", "variables": {...}}``
+    returns ``{"result": ...}``; errors are 400 with ``{"detail": ...}``.
+  - ``POST /evaluate`` with a JSON array of such objects (or plain expression
+    strings) returns ``{"results": [...]}``, one ``{"result": ...}`` or
+    ``{"error": ...}`` per item, in order.
+  - ``GET /cache`` returns the expression cache counters.
+
+Every request goes through ``evaluate()``'s shared LRU cache, so an
+expression is parsed and compiled once per server process and later requests
+only bind variables. Each request is evaluated in one worker thread call
+and answered with 503 after ``EVAL_TIMEOUT`` seconds: within the resource
+limits a single exact big-int operation can still take a good fraction of a
+second, and a large expression or batch several seconds. With
+``uvicorn --workers N`` each process has its own cache.
+
+The load generator needs ``httpx``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import decimal
+import itertools
+import math
+import socket
+import statistics
+import sys
+import threading
+import time
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from calculator import cache_info, configure_backend, configure_cache, evaluate
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - only needed for the load generator
+    httpx = None
+
+# Largest JSON array accepted by one POST /evaluate.
+MAX_BATCH = 10_000
+# Seconds one POST /evaluate may spend evaluating before it gets a 503.
+EVAL_TIMEOUT = 5.0
+
+app = FastAPI()
+
+
+def _to_json(value):
+    # Decimal and Fraction results keep their exact text; inf/nan are not
+    # valid JSON numbers. Ints past sys.get_int_max_str_digits() cannot be
+    # written out at all, so they fail here, per item, and not in the encoder.
+    if type(value) is int:
+        limit = sys.get_int_max_str_digits()
+        # 8**limit has fewer than ``limit`` digits, so smaller ints are fine.
+        if limit and value.bit_length() > 3 * limit:
+            try:
+                str(value)
+            except ValueError:
+                raise ValueError(f"Result has more than {limit} digits") from None
+        return value
+    if type(value) is float and math.isfinite(value):
+        return value
+    return str(value)
+
+
+def _variables(data) -> dict:
+    variables = data.get("variables") or {}
+    if not isinstance(variables, dict):
+        raise ValueError("variables must be an object")
+    for name, value in variables.items():
+        if type(value) not in (int, float):
+            raise ValueError(f"Variable {name} must be a number")
+    return variables
+
+
+def _evaluate_item(item):
+    if isinstance(item, str):
+        return _to_json(evaluate(item))
+    if not isinstance(item, dict) or not isinstance(item.get("expr"), str):
+        raise ValueError('Expected an expression string or {"expr": ...}')
+    return _to_json(evaluate(item["expr"], **_variables(item)))
+
+
+def _evaluate_body(data) -> dict:
+    """Evaluates a request body; runs in a worker thread."""
+    if isinstance(data, list):
+        results = []
+        append = results.append
+        for item in data:
+            try:
+                append({"result": _evaluate_item(item)})
+            except Exception as e:
+                append({"error": str(e)})
+        return {"results": results}
+    return {"result": _evaluate_item(data)}
+
+
+@app.post("/evaluate")
+async def evaluate_endpoint(request: Request):
+    try:
+        data = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+
+    if isinstance(data, list) and len(data) > MAX_BATCH:
+        raise HTTPException(
+            status_code=413, detail=f"At most {MAX_BATCH} expressions per request"
+        )
+    # A thread cannot be interrupted, so a timed-out evaluation runs on to
+    # the end; the timeout only bounds how long the client waits. Big-int
+    # operations hold the GIL, so such a request still slows the others.
+    try:
+        body = await asyncio.wait_for(
+            asyncio.to_thread(_evaluate_body, data), EVAL_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=503, detail=f"Evaluation took longer than {EVAL_TIMEOUT} s"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # JSONResponse directly: the results are already plain JSON values, so
+    # FastAPI's jsonable_encoder pass would only add overhead.
+    return JSONResponse(body)
+
+
+@app.get("/cache")
+async def cache_endpoint():
+    return cache_info()._asdict()
+
+
+# --- Load generator ----------------------------------------------------------
+
+FORMULA = "price * qty * (1 - discount)"
+
+
+def _payloads(expr: str, batch: int, count: int = 64) -> list:
+    # A few distinct bindings so the server cannot answer from a fixed
+    # response; the expression itself stays cached.
+    items = [
+        {
+            "expr": expr,
+            "variables": {"price": 10 + i, "qty": i % 7 + 1, "discount": 0.1},
+        }
+        for i in range(count)
+    ]
+    if not batch:
+        return items
+    return [[items[(i + j) % count] for j in range(batch)] for i in range(count)]
+
+
+async def _run_load(
+    url: str, payloads: list, number: int, concurrency: int, timeout: float
+) -> dict:
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    latencies = []
+    errors = 0
+    counter = itertools.count()
+
+    async with httpx.AsyncClient(
+        base_url=url, limits=limits, timeout=timeout
+    ) as client:
+
+        async def worker():
+            nonlocal errors
+            clock = time.perf_counter
+            while (i := next(counter)) < number:
+                t0 = clock()
+                try:
+                    response = await client.post(
+                        "/evaluate", json=payloads[i % len(payloads)]
+                    )
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(clock() - t0)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": number,
+        "errors": errors,
+        "seconds": elapsed,
+        "requests_per_sec": number / elapsed,
+        "p50_ms": quantiles[49] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+    }
+
+
+def _start_in_process(host: str) -> tuple[str, object, threading.Thread]:
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(
+        uvicorn.Config(app, host=host, port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise SystemExit("in-process server failed to start")
+        time.sleep(0.01)
+    return f"http://{host}:{port}", server, thread
+
+
+def load(args: argparse.Namespace) -> int:
+    if httpx is None:
+        raise SystemExit("the load generator needs httpx: pip install httpx")
+    server = thread = None
+    url = args.url
+    if url is None:
+        # Shares the CPU (and the GIL) with the load generator: good for a
+        # quick check, use --url against a separate process for real numbers.
+        url, server, thread = _start_in_process("127.0.0.1")
+    try:
+        payloads = _payloads(args.expr, args.batch_size)
+        stats = asyncio.run(
+            _run_load(url, payloads, args.number, args.concurrency, args.timeout)
+        )
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join()
+
+    per_request = args.batch_size or 1
+    print(f"url:            {url}")
+    print(f"requests:       {stats['requests']} ({stats['errors']} errors)")
+    print(f"concurrency:    {args.concurrency}")
+    print(f"requests/sec:   {stats['requests_per_sec']:,.0f}")
+    print(f"exprs/sec:      {stats['requests_per_sec'] * per_request:,.0f}")
+    print(f"latency p50/99: {stats['p50_ms']:.2f} / {stats['p99_ms']:.2f} ms")
+    return 1 if stats["errors"] else 0
+
+
+def serve(args: argparse.Namespace) -> int:
+    import uvicorn
+
+    global EVAL_TIMEOUT
+    EVAL_TIMEOUT = args.eval_timeout
+    context = None
+    if args.precision is not None:
+        context = decimal.Context(prec=args.precision)
+    configure_backend(args.numeric, context)
+    configure_cache(args.cache_size)
+    uvicorn.run(app, host=args.host, port=args.port, access_log=args.access_log)
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Calculator HTTP service")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("serve", help="Run the HTTP server")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument(
+        "--cache-size",
+        type=int,
+        default=cache_info().maxsize,
+        help="Max compiled expressions to cache (0 disables the cache)",
+    )
+    p.add_argument(
+        "--numeric",
+        choices=("float", "decimal", "fraction"),
+        default="float",
+        help="Numeric backend (default: float)",
+    )
+    p.add_argument(
+        "--precision", type=int, help="Significant digits for --numeric decimal"
+    )
+    p.add_argument(
+        "--eval-timeout",
+        type=float,
+        default=EVAL_TIMEOUT,
+        help=f"Seconds per request before a 503 (default: {EVAL_TIMEOUT})",
+    )
+    p.add_argument(
+        "--access-log",
+        action="store_true",
+        help="Log every request (off by default: it costs throughput)",
+    )
+    p.set_defaults(func=serve)
+
+    p = sub.add_parser("load", help="Send requests and report requests/sec")
+    p.add_argument("--url", help="Server to load (default: start one in this process)")
+    p.add_argument("-n", "--number", type=int, default=10000, help="Requests")
+    p.add_argument(
+        "-c", "--concurrency", type=int, default=16, help="Requests in flight"
+    )
+    p.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=0,
+        help="Expressions per request as a JSON array (0 = single objects)",
+    )
+    p.add_argument("-e", "--expr", default=FORMULA, help="Expression to send")
+    p.add_argument("--timeout", type=float, default=10.0, help="Seconds")
+    p.set_defaults(func=load)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,3 +1,14 @@
+import argparse
+import sys
+from decimal import Decimal
+from fractions import Fraction
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from expr_core import make_evaluator  # noqa: E402
+
+
 def add(x, y):
     return x + y
 
@@ -16,23 +27,48 @@ def divide(x, y):
     return x / y
 
 
-def calculator():
+def _divide_or_raise(x, y):
+    # Inside an expression the error string cannot be used as an operand.
+    if y == 0:
+        raise ValueError("Error: Division by zero")
+    return x / y
+
+
+OPERATORS = {"+": add, "-": subtract, "*": multiply, "/": _divide_or_raise}
+
+# Number types for --numeric; the chosen one converts both the menu inputs
+# and the numbers in expressions.
+NUMBER_TYPES = {"float": float, "decimal": Decimal, "fraction": Fraction}
+
+evaluate = make_evaluator(OPERATORS)
+
+
+def calculator(number=float):
+    evaluate = make_evaluator(OPERATORS, number)
     print("Simple Calculator")
     print("Select operation:")
     print("1. Add")
     print("2. Subtract")
     print("3. Multiply")
     print("4. Divide")
+    print("5. Expression (e.g. (1 + 2) * 3)")
 
     while True:
-        choice = raw_input("Enter choice (1/2/3/4) or 'q' to quit: ")
+        choice = input("Enter choice (1/2/3/4/5) or 'q' to quit: ")
         if choice == "q":
             break
+        if choice == "5":
+            expr = input("Enter expression: ")
+            try:
+                print("{0} = {1}".format(expr.strip(), evaluate(expr)))
+            except (ValueError, ArithmeticError) as e:
+                print("Invalid expression: {0}".format(e))
+            continue
         if choice in ["1", "2", "3", "4"]:
             try:
-                num1 = float(raw_input("Enter first number: "))
-                num2 = float(raw_input("Enter second number: "))
-            except ValueError:
+                num1 = number(input("Enter first number: "))
+                num2 = number(input("Enter second number: "))
+            except (ValueError, ArithmeticError):
                 print("Invalid input. Please enter numbers.")
                 continue
 
@@ -46,8 +82,10 @@ def calculator():
                 result = divide(num1, num2)
                 print("{0} / {1} = {2}".format(num1, num2, result))
         else:
-            print("Invalid choice. Please select 1, 2, 3, 4 or 'q'.")
+            print("Invalid choice. Please select 1, 2, 3, 4, 5 or 'q'.")
 
 
 if __name__ == "__main__":
-    calculator()
+    parser = argparse.ArgumentParser(description="Simple calculator")
+    parser.add_argument("--numeric", choices=NUMBER_TYPES, default="float")
+    calculator(NUMBER_TYPES[parser.parse_args().numeric])
@@ -1,32 +1,187 @@
+import argparse
+import base64
+import io
+import json
 import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from openai import OpenAI
+from PIL import Image, ImageOps
 
-client = OpenAI(
-    base_url=os.getenv("OPENAI_BASE_URL"),
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
-
-completion = client.chat.completions.create(
-    extra_headers={
-        # "HTTP-Referer": "<YOUR_SITE_URL>", # Optional. Site URL for rankings on openrouter.ai.
-        # "X-Title": "<YOUR_SITE_NAME>", # Optional. Site title for rankings on openrouter.ai.
-    },
-    extra_body={},
-    model="x-ai/grok-4-fast:free",
-    messages=[
-        {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": "What is in this image?"},
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": "https://upload.wikimedia.org/wikipedia/commons/thumb/d/dd/Gfp-wisconsin-madison-the-nature-boardwalk.jpg/2560px-Gfp-wisconsin-madison-the-nature-boardwalk.jpg"
-                    },
-                },
-            ],
-        }
-    ],
-)
-print(completion.choices[0].message.content)
+MODEL = os.getenv("OPENAI_MODEL", "x-ai/grok-4-fast:free")
+PROMPT = "What is in this image?"
+EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff"}
+# そのまま data URL にできる形式
+MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+
+def find_images(paths):
+    """ファイルはそのまま、ディレクトリは中の画像を再帰的に集める。"""
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in EXTENSIONS:
+                        images.append(os.path.join(root, name))
+        else:
+            images.append(path)
+    return images
+
+
+def encode_image(path, max_size, image_format="JPEG", quality=85):
+    """長辺を ``max_size`` px 以下に縮小して再エンコードし、(data URL, 情報) を返す。
+
+    縮小が要らず、元のファイルの方が小さく、そのまま送れる形式なら
+    元のバイト列を使う。
+    """
+    with open(path, "rb") as f:
+        original = f.read()
+    with Image.open(io.BytesIO(original)) as image:
+        source_format = image.format
+        width, height = image.size
+        # JPEG は縮小しながらデコードできるので、全画素を展開せずに済む
+        image.draft("RGB", (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+        if max(width, height) > max_size:
+            image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        if image_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, image_format, quality=quality, optimize=True)
+        data, mime = buffer.getvalue(), MIME_TYPES[image_format]
+        size = image.size
+
+    if (
+        max(width, height) <= max_size
+        and source_format in MIME_TYPES
+        and len(original) <= len(data)
+    ):
+        data, mime = original, MIME_TYPES[source_format]
+    info = {
+        "original_bytes": len(original),
+        "sent_bytes": len(data),
+        "original_size": [width, height],
+        "sent_size": list(size),
+    }
+    return f"data:{mime};base64,{base64.b64encode(data).decode()}", info
+
+
+def describe(client, path, args):
+    """画像 1 枚を送り、JSONL の 1 行分の dict を返す。失敗は ``error`` に入れる。"""
+    result = {"path": path}
+    start = time.perf_counter()
+    try:
+        url, info = encode_image(path, args.max_size, args.format, args.quality)
+        result.update(info)
+        if not args.dry_run:
+            completion = client.chat.completions.create(
+                model=args.model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": args.prompt},
+                            {"type": "image_url", "image_url": {"url": url}},
+                        ],
+                    }
+                ],
+            )
+            result["reply"] = completion.choices[0].message.content
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def run(client, paths, args, out):
+    """画像を ``args.concurrency`` 並列で送り、終わった順に JSONL を書く。
+
+    エラーの件数を返す。
+    """
+    original_bytes = sent_bytes = errors = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(describe, client, path, args) for path in paths]
+        for future in as_completed(futures):
+            result = future.result()
+            if "error" in result:
+                errors += 1
+            original_bytes += result.get("original_bytes", 0)
+            sent_bytes += result.get("sent_bytes", 0)
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{len(paths)} images ({errors} errors) in {elapsed:.2f} s, "
+        f"{original_bytes / 1e6:.1f} MB -> {sent_bytes / 1e6:.1f} MB sent",
+        file=sys.stderr,
+    )
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Describe local images with a vision model and write JSONL"
+    )
+    parser.add_argument("paths", nargs="+", help="Image files or directories")
+    parser.add_argument("--prompt", default=PROMPT, help=f"(default: {PROMPT!r})")
+    parser.add_argument("--model", default=MODEL, help=f"(default: {MODEL})")
+    parser.add_argument(
+        "--max-size",
+        type=int,
+        default=1024,
+        help="Downscale so the longer side is at most this many px (default: 1024)",
+    )
+    parser.add_argument(
+        "--format",
+        type=str.upper,
+        choices=sorted(MIME_TYPES),
+        default="JPEG",
+        help="Re-encode format (default: JPEG)",
+    )
+    parser.add_argument(
+        "--quality", type=int, default=85, help="JPEG/WebP quality (default: 85)"
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Images in flight (default: 4)",
+    )
+    parser.add_argument(
+        "-o", "--output", help="Write JSONL to this file (default: stdout)"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only encode the images and report sizes, without calling the API",
+    )
+    args = parser.parse_args()
+
+    paths = find_images(args.paths)
+    if not paths:
+        parser.error("no images found")
+
+    # 1 つのクライアントを全ワーカーで共有し、接続を使い回す
+    client = None
+    if not args.dry_run:
+        client = OpenAI(
+            base_url=os.getenv("OPENAI_BASE_URL"),
+            api_key=os.getenv("OPENAI_API_KEY"),
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            errors = run(client, paths, args, out)
+    else:
+        errors = run(client, paths, args, sys.stdout)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,10 +1,256 @@
+import json
 import os
+import time
+from contextlib import asynccontextmanager, nullcontext
 
-from fastapi import FastAPI, Request
+import httpx
+import openai
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from openai import OpenAI
+from fastapi.responses import StreamingResponse
+from openai import AsyncOpenAI
+
+from cache import DiskCache, MemoryCache, TieredCache, make_key
+from metrics import (
+    CONTENT_TYPE,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsMiddleware,
+)
+from sessions import SessionStore
+from upstream import AdmissionQueue, QueueFull, SingleFlight, retry_with_jitter
+
+MODEL = os.getenv("OPENAI_MODEL", "x-ai/grok-4-fast:free")
+SYSTEM_PROMPT = "あなたは親切なアシスタントです。"
+
+
+def _env_float(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+# 上流 (OpenAI 互換 API) への接続プール設定
+MAX_CONNECTIONS = int(_env_float("UPSTREAM_MAX_CONNECTIONS", 100))
+MAX_KEEPALIVE = int(_env_float("UPSTREAM_MAX_KEEPALIVE", 20))
+KEEPALIVE_EXPIRY = _env_float("UPSTREAM_KEEPALIVE_EXPIRY", 30.0)
+TIMEOUT = _env_float("UPSTREAM_TIMEOUT", 60.0)
+CONNECT_TIMEOUT = _env_float("UPSTREAM_CONNECT_TIMEOUT", 5.0)
+
+# 上流への同時呼び出し数と、空きを待てるリクエスト数 (超えたら 503)
+CONCURRENCY = int(_env_float("UPSTREAM_CONCURRENCY", 16))
+MAX_WAITING = int(_env_float("UPSTREAM_QUEUE", 256))
+# 429 などの再試行 (指数バックオフ + jitter)
+RETRIES = int(_env_float("UPSTREAM_RETRIES", 3))
+RETRY_BASE = _env_float("UPSTREAM_RETRY_BASE", 0.5)
+RETRY_CAP = _env_float("UPSTREAM_RETRY_CAP", 8.0)
+
+# 同期クライアントを async ハンドラから呼ぶとイベントループが止まり、
+# 同時に 1 リクエストしか処理できないため、非同期クライアントを 1 つだけ作り
+# 全リクエストで接続プールを共有する。
+# 再試行は retry_with_jitter で行うので、SDK 自身の再試行は切る。
+client = AsyncOpenAI(
+    base_url=os.getenv("OPENAI_BASE_URL"),
+    api_key=os.getenv("OPENAI_API_KEY"),
+    max_retries=0,
+    http_client=httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT),
+    ),
+)
+
+
+# 応答キャッシュ: CHAT_CACHE_SIZE=0 で無効、CHAT_CACHE_PATH でディスクにも保存
+CACHE_SIZE = int(_env_float("CHAT_CACHE_SIZE", 1024))
+CACHE_TTL = _env_float("CHAT_CACHE_TTL", 3600.0)
+CACHE_PATH = os.getenv("CHAT_CACHE_PATH")
+CACHE_DISK_SIZE = int(_env_float("CHAT_CACHE_DISK_SIZE", 100_000))
+
+
+def _make_cache():
+    if CACHE_SIZE <= 0:
+        return None
+    memory = MemoryCache(CACHE_SIZE, CACHE_TTL)
+    if CACHE_PATH:
+        return TieredCache(memory, DiskCache(CACHE_PATH, CACHE_DISK_SIZE, CACHE_TTL))
+    return memory
+
+
+# セッション: 履歴は SESSION_TOKEN_BUDGET を超えたら SESSION_TRIM_TARGET まで
+# 古い往復から捨てる。SESSION_SUMMARIZE=1 なら捨てる往復を要約して残す
+SESSION_MAX = int(_env_float("SESSION_MAX", 10_000))
+SESSION_TTL = _env_float("SESSION_TTL", 3600.0)
+SESSION_TOKEN_BUDGET = int(_env_float("SESSION_TOKEN_BUDGET", 2000))
+SESSION_TRIM_TARGET = int(_env_float("SESSION_TRIM_TARGET", SESSION_TOKEN_BUDGET / 2))
+SESSION_SUMMARIZE = bool(_env_float("SESSION_SUMMARIZE", 0))
+SESSION_SUMMARY_TOKENS = int(_env_float("SESSION_SUMMARY_TOKENS", 256))
+SUMMARY_PROMPT = (
+    "次の会話を、後の会話に必要な事実や決定事項を残して、"
+    "日本語で簡潔に要約してください。"
+)
+
+response_cache = _make_cache()
+sessions = SessionStore(SESSION_MAX, SESSION_TTL)
+flights = SingleFlight()
+admission = AdmissionQueue(CONCURRENCY, MAX_WAITING)
+
+
+# メトリクス (GET /metrics で Prometheus のテキスト形式で公開)
+REQUESTS = Counter(
+    "chat_http_requests_total",
+    "HTTP requests handled by this server",
+    ["path", "method", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "chat_http_request_duration_seconds",
+    "Time to handle a request, until the last byte of the response",
+    ["path"],
+)
+UPSTREAM_LATENCY = Histogram(
+    "chat_upstream_request_duration_seconds",
+    "Time of one upstream call attempt (stream: until the stream opens)",
+    ["mode", "outcome"],
+)
+UPSTREAM_FIRST_TOKEN = Histogram(
+    "chat_upstream_first_token_seconds",
+    "Time from the upstream call to its first streamed token",
+)
+UPSTREAM_RETRIES = Counter(
+    "chat_upstream_retries_total", "Upstream call retries", ["reason"]
+)
+QUEUE_WAIT = Histogram(
+    "chat_queue_wait_seconds", "Time spent waiting for an upstream call slot"
+)
+TOKENS = Counter("chat_tokens_total", "Tokens reported in the upstream usage", ["type"])
+Gauge("chat_queue_waiting", "Requests waiting for a slot", lambda: admission.waiting)
+Gauge("chat_upstream_active", "Upstream calls in progress", lambda: admission.active)
+Counter(
+    "chat_queue_rejected_total",
+    "Requests rejected because the queue was full",
+    fn=lambda: admission.rejected,
+)
+Gauge(
+    "chat_coalesce_in_flight",
+    "Distinct upstream calls others can share",
+    lambda: flights.in_flight,
+)
+Counter(
+    "chat_coalesced_total",
+    "Requests that shared an identical in-flight upstream call",
+    fn=lambda: flights.shared,
+)
+Gauge("chat_sessions", "Conversation sessions held in memory", lambda: len(sessions))
+Counter(
+    "chat_session_evictions_total",
+    "Sessions evicted to stay under the session limit",
+    fn=lambda: sessions.evictions,
+)
+SESSION_TRIMMED = Counter(
+    "chat_session_trimmed_turns_total",
+    "Conversation turns dropped from sessions to fit the token budget",
+)
+SESSION_SUMMARIES = Counter(
+    "chat_session_summaries_total", "Session history summaries", ["outcome"]
+)
+Counter(
+    "chat_cache_hits_total",
+    "Response cache hits",
+    fn=lambda: response_cache.hits if response_cache else 0,
+)
+Counter(
+    "chat_cache_misses_total",
+    "Response cache misses",
+    fn=lambda: response_cache.misses if response_cache else 0,
+)
+
+
+def _on_retry(error):
+    reason = "rate_limited" if isinstance(error, openai.RateLimitError) else "error"
+    UPSTREAM_RETRIES.inc(reason=reason)
+
+
+def _record_usage(usage):
+    if usage is not None:
+        TOKENS.inc(usage.prompt_tokens or 0, type="prompt")
+        TOKENS.inc(usage.completion_tokens or 0, type="completion")
+
+
+async def _create(**kwargs):
+    """上流を 1 回呼び、所要時間と結果をメトリクスに記録する。"""
+    mode = "stream" if kwargs.get("stream") else "chat"
+    outcome = "error"
+    start = time.perf_counter()
+    try:
+        result = await client.chat.completions.create(model=MODEL, **kwargs)
+        outcome = "ok"
+        return result
+    except openai.RateLimitError:
+        outcome = "rate_limited"
+        raise
+    finally:
+        UPSTREAM_LATENCY.observe(
+            time.perf_counter() - start, mode=mode, outcome=outcome
+        )
+
+
+async def _call_upstream(**kwargs):
+    return await retry_with_jitter(
+        lambda: _create(**kwargs), RETRIES, RETRY_BASE, RETRY_CAP, _on_retry
+    )
+
+
+async def _complete(messages, **kwargs):
+    """枠を確保して上流を呼び、応答の本文を返す。"""
+    async with admission.slot() as waited:
+        QUEUE_WAIT.observe(waited)
+        completion = await _call_upstream(messages=messages, **kwargs)
+    _record_usage(completion.usage)
+    return completion.choices[0].message.content
 
-app = FastAPI()
+
+async def _summarize(summary, turns):
+    lines = [f"これまでの要約: {summary}"] if summary else []
+    for user, assistant, _ in turns:
+        lines.append(f"ユーザー: {user}")
+        lines.append(f"アシスタント: {assistant}")
+    return await _complete(
+        [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": "\n".join(lines)},
+        ],
+        max_tokens=SESSION_SUMMARY_TOKENS,
+    )
+
+
+async def _session_messages(session, user_input):
+    """履歴をトークン予算に収めてから、上流に送るメッセージを作る。"""
+    dropped = session.trim(SESSION_TOKEN_BUDGET, SESSION_TRIM_TARGET)
+    if dropped:
+        SESSION_TRIMMED.inc(len(dropped))
+        if SESSION_SUMMARIZE:
+            # 要約に失敗しても会話は続け、古い往復は捨てたままにする
+            try:
+                session.set_summary(await _summarize(session.summary, dropped) or "")
+                SESSION_SUMMARIES.inc(outcome="ok")
+            except (QueueFull, openai.APIError):
+                SESSION_SUMMARIES.inc(outcome="error")
+    return session.messages(SYSTEM_PROMPT, user_input)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await client.close()
+    if isinstance(response_cache, TieredCache):
+        response_cache.disk.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS設定（フロントエンドからアクセス可能にする）
 app.add_middleware(
@@ -14,25 +260,216 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    MetricsMiddleware, requests_total=REQUESTS, request_latency=REQUEST_LATENCY
+)
 
 
-client = OpenAI(
-    base_url=os.getenv("OPENAI_BASE_URL"),
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
+def _cache_policy(request):
+    """Cache-Control ヘッダから (キャッシュを読むか, 書くか) を決める。
+
+    ``no-cache`` はキャッシュを読まずに上流へ問い合わせて結果を保存し直し、
+    ``no-store`` はキャッシュを読みも書きもしない。
+    """
+    if response_cache is None:
+        return False, False
+    directives = request.headers.get("cache-control", "").lower()
+    if "no-store" in directives:
+        return False, False
+    if "no-cache" in directives:
+        return False, True
+    return True, True
 
 
 @app.post("/chat")
-async def chat(request: Request):
+async def chat(request: Request, response: Response):
     data = await request.json()
     user_input = data.get("message", "")
+    session_id = data.get("session_id")
+    if session_id is not None:
+        # 履歴によって応答が変わるので、キャッシュも相乗りもしない
+        response.headers["X-Cache"] = "BYPASS"
+        session = sessions.get(str(session_id))
+        async with session.lock:
+            try:
+                messages = await _session_messages(session, user_input)
+                reply = await _complete(messages)
+            except (QueueFull, openai.APIError) as e:
+                raise _http_error(e)
+            session.add(user_input, reply or "")
+        return {"reply": reply, "session_id": session.id}
+
+    key = make_key(MODEL, SYSTEM_PROMPT, user_input)
+    read, write = _cache_policy(request)
+    if read:
+        reply = await response_cache.aget(key)
+        if reply is not None:
+            response.headers["X-Cache"] = "HIT"
+            return {"reply": reply}
+    response.headers["X-Cache"] = "MISS" if read else "BYPASS"
+
+    async def fetch():
+        reply = await _complete(_messages(user_input))
+        if write and reply is not None:
+            await response_cache.aset(key, reply)
+        return reply
+
+    # 同じ内容のリクエストが上流を待っている間は、その結果を共有する
+    try:
+        reply = await flights.do((key, write), fetch)
+    except (QueueFull, openai.APIError) as e:
+        raise _http_error(e)
+
+    return {"reply": reply}
+
+
+def _http_error(error):
+    if isinstance(error, QueueFull):
+        return HTTPException(
+            status_code=503,
+            detail="Too many requests waiting for the upstream",
+            headers={"Retry-After": "1"},
+        )
+    if isinstance(error, openai.RateLimitError):
+        return HTTPException(status_code=429, detail="Upstream rate limit exceeded")
+    return HTTPException(status_code=502, detail=f"Upstream error: {error}")
 
-    response = client.chat.completions.create(
-        model="x-ai/grok-4-fast:free",
-        messages=[
-            {"role": "system", "content": "あなたは親切なアシスタントです。"},
-            {"role": "user", "content": user_input},
-        ],
-    )
 
-    return {"reply": response.choices[0].message.content}
+@app.get("/metrics")
+async def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.post("/sessions")
+async def create_session():
+    return {"session_id": sessions.create().id}
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    session = sessions.get(session_id, create=False)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session.to_dict()
+
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"deleted": session_id}
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats()}
+
+
+def _messages(user_input):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_input},
+    ]
+
+
+def _sse(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: Request):
+    """上流のトークンを届いた順に Server-Sent Events で返す。
+
+    トークンごとに ``data: {"token": ...}`` を送り、最後に
+    ``event: done`` で上流の最初のトークンまでの時間 (ttft_ms) と
+    全体の時間 (total_ms) を送る。``session_id`` を指定すると
+    ``/chat`` と同じくセッションの履歴を使い、キャッシュはしない。
+    """
+    data = await request.json()
+    user_input = data.get("message", "")
+    session_id = data.get("session_id")
+    session = sessions.get(str(session_id)) if session_id is not None else None
+
+    key = make_key(MODEL, SYSTEM_PROMPT, user_input)
+    read, write = _cache_policy(request)
+    if session is not None:
+        read = write = False
+    cached = await response_cache.aget(key) if read else None
+    if cached is not None:
+        status = "HIT"
+    else:
+        status = "MISS" if read else "BYPASS"
+
+    # ヘッダを送る前に断れるよう、待ち行列が一杯なら先に 503 を返す
+    if cached is None and admission.full():
+        raise _http_error(QueueFull())
+
+    async def cached_events():
+        yield _sse({"token": cached})
+        yield _sse({"ttft_ms": 0.0, "total_ms": 0.0}, event="done")
+
+    async def events():
+        start = time.perf_counter()
+        ttft = None
+        tokens = []
+        try:
+            # セッションのロックと枠は、ストリームを読み終えるまで保持する
+            async with session.lock if session is not None else nullcontext():
+                if session is not None:
+                    messages = await _session_messages(session, user_input)
+                else:
+                    messages = _messages(user_input)
+                async with admission.slot() as waited:
+                    QUEUE_WAIT.observe(waited)
+                    upstream_start = time.perf_counter()
+                    stream = await _call_upstream(
+                        messages=messages,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                    )
+                    async for chunk in stream:
+                        # include_usage の場合、最後のチャンクに usage が付く
+                        _record_usage(chunk.usage)
+                        if not chunk.choices:
+                            continue
+                        token = chunk.choices[0].delta.content
+                        if not token:
+                            continue
+                        if ttft is None:
+                            ttft = time.perf_counter() - start
+                            UPSTREAM_FIRST_TOKEN.observe(
+                                time.perf_counter() - upstream_start
+                            )
+                        tokens.append(token)
+                        yield _sse({"token": token})
+                if session is not None:
+                    session.add(user_input, "".join(tokens))
+        except Exception as e:
+            # ヘッダは送信済みなので、エラーもイベントとして返す
+            yield _sse({"error": str(e)}, event="error")
+            return
+        total = time.perf_counter() - start
+        if write:
+            await response_cache.aset(key, "".join(tokens))
+        yield _sse(
+            {
+                "ttft_ms": None if ttft is None else round(ttft * 1000, 1),
+                "total_ms": round(total * 1000, 1),
+            },
+            event="done",
+        )
+
+    # X-Accel-Buffering: リバースプロキシ (nginx) にバッファリングさせない
+    return StreamingResponse(
+        cached_events() if cached is not None else events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "X-Cache": status,
+            **({"X-Session-Id": session.id} if session is not None else {}),
+        },
+    )
@@ -0,0 +1,253 @@
+"""チャット応答のキャッシュ。
+
+同じモデル・システムプロンプト・ユーザーメッセージへの応答を再利用し、
+上流への往復を省く。
+
+- ``MemoryCache``: プロセス内の LRU (件数上限と TTL)
+- ``DiskCache``: SQLite ファイルに保存し、再起動後も使える (件数上限と TTL)
+- ``TieredCache``: メモリを先に引き、外れたらディスクを引く
+
+どれも ``get(key)`` / ``set(key, value)`` / ``stats()`` を持つので、
+``ResponseCache`` を継承すれば別のストア (Redis など) に差し替えられる。
+イベントループからは ``aget`` / ``aset`` を使う (ディスクはスレッドで読み書きする)。
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+def make_key(model, system_prompt, user_message):
+    raw = json.dumps([model, system_prompt, user_message], ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ResponseCache(ABC):
+    """キャッシュの共通部分 (ヒット率の集計)。
+
+    ストアは ``_get`` / ``set`` / ``__len__`` を実装する。足りないと作成時にエラーになる。
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        return self._record(self._get(key))
+
+    async def aget(self, key):
+        return self._record(await self._aget(key))
+
+    def _record(self, value):
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    @abstractmethod
+    def set(self, key, value):
+        """``value`` を保存する。"""
+
+    async def aset(self, key, value):
+        self.set(key, value)
+
+    @abstractmethod
+    def _get(self, key):
+        """値を返す。無いか期限切れなら None。"""
+
+    async def _aget(self, key):
+        # メモリ上のストアはすぐ終わるので、そのまま呼ぶ
+        return self._get(key)
+
+    @abstractmethod
+    def __len__(self):
+        """保存している件数。"""
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self),
+        }
+
+
+class MemoryCache(ResponseCache):
+    def __init__(self, maxsize=1024, ttl=3600.0):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        # key -> (expires_at, value)。末尾ほど最近使ったもの
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {**super().stats(), "maxsize": self.maxsize, "evictions": self.evictions}
+
+
+class DiskCache(ResponseCache):
+    # ヒットのたびに書き込まないよう、used_at はこの秒数より古いときだけ更新する
+    TOUCH_INTERVAL = 60.0
+
+    def __init__(self, path, maxsize=100_000, ttl=86400.0):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT, expires_at REAL, used_at REAL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)"
+        )
+        self._db.commit()
+        # 件数は起動時に 1 度だけ数え、以後は増減を追う
+        self._size = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _get(self, key):
+        # 時刻はプロセスをまたぐので monotonic ではなく time.time() を使う
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at, used_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                self._size -= 1
+                return None
+            if now - row[2] > self.TOUCH_INTERVAL:
+                self._db.execute(
+                    "UPDATE responses SET used_at = ? WHERE key = ?", (now, key)
+                )
+                self._db.commit()
+            return row[0]
+
+    async def _aget(self, key):
+        return await asyncio.to_thread(self._get, key)
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            updated = self._db.execute(
+                "UPDATE responses SET value = ?, expires_at = ?, used_at = ?"
+                " WHERE key = ?",
+                (value, now + self.ttl, now, key),
+            ).rowcount
+            if not updated:
+                self._db.execute(
+                    "INSERT INTO responses VALUES (?, ?, ?, ?)",
+                    (key, value, now + self.ttl, now),
+                )
+                self._size += 1
+            if self._size > self.maxsize:
+                self._evict(now)
+            self._db.commit()
+
+    async def aset(self, key, value):
+        await asyncio.to_thread(self.set, key, value)
+
+    def _evict(self, now):
+        # 上限を超えたら期限切れと、最近使われていないものから消す (どちらも索引を引く)
+        removed = self._db.execute(
+            "DELETE FROM responses WHERE expires_at <= ?", (now,)
+        ).rowcount
+        excess = self._size - removed - self.maxsize
+        if excess > 0:
+            removed += self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY used_at LIMIT ?)",
+                (excess,),
+            ).rowcount
+        self._size -= removed
+        self.evictions += removed
+
+    def __len__(self):
+        return self._size
+
+    def stats(self):
+        return {**super().stats(), "maxsize": self.maxsize, "evictions": self.evictions}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class TieredCache(ResponseCache):
+    def __init__(self, memory, disk):
+        super().__init__()
+        self.memory = memory
+        self.disk = disk
+
+    def _get(self, key):
+        value = self.memory.get(key)
+        if value is None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    async def _aget(self, key):
+        value = self.memory.get(key)
+        if value is None:
+            value = await self.disk.aget(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+    async def aset(self, key, value):
+        self.memory.set(key, value)
+        await self.disk.aset(key, value)
+
+    def __len__(self):
+        return len(self.memory)
+
+    def stats(self):
+        return {
+            **super().stats(),
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats(),
+        }
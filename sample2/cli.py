@@ -1,8 +1,216 @@
+import argparse
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
+from requests.adapters import HTTPAdapter
+
+URL = "http://localhost:8000"
+
+
+def make_session(pool_size=1):
+    # 1 つのセッションで接続を使い回し、リクエストごとの TCP 接続を避ける
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _events(response):
+    # Server-Sent Events を (event, data) の組に分解する
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            event = None
+        elif line.startswith("event:"):
+            event = line[len("event:") :].strip()
+        elif line.startswith("data:"):
+            yield event or "message", json.loads(line[len("data:") :])
+
+
+def _body(user_input, session_id):
+    body = {"message": user_input}
+    if session_id is not None:
+        body["session_id"] = session_id
+    return body
+
+
+def create_session(session, url):
+    """サーバ側に会話のセッションを作り、その id を返す。"""
+    res = session.post(f"{url}/sessions")
+    res.raise_for_status()
+    return res.json()["session_id"]
+
+
+def chat_stream(session, url, user_input, on_token=None, session_id=None):
+    """``/chat/stream`` に送り、(応答, 最初のトークンまでの秒数, 全体の秒数) を返す。"""
+    start = time.perf_counter()
+    first = None
+    tokens = []
+    with session.post(
+        f"{url}/chat/stream", json=_body(user_input, session_id), stream=True
+    ) as res:
+        res.raise_for_status()
+        for event, data in _events(res):
+            if event == "error":
+                raise RuntimeError(data["error"])
+            if event == "done":
+                break
+            if first is None:
+                first = time.perf_counter() - start
+            tokens.append(data["token"])
+            if on_token is not None:
+                on_token(data["token"])
+    return "".join(tokens), first, time.perf_counter() - start
+
+
+def chat(session, url, user_input, session_id=None):
+    """``/chat`` に送り、(応答, None, 全体の秒数) を返す。"""
+    start = time.perf_counter()
+    res = session.post(f"{url}/chat", json=_body(user_input, session_id))
+    res.raise_for_status()
+    return res.json()["reply"], None, time.perf_counter() - start
+
+
+def interactive(session, url, stream, session_id=None):
+    while True:
+        user_input = input("You: ")
+        if user_input.lower() in ["exit", "quit"]:
+            break
+        try:
+            if stream:
+                print("Bot: ", end="", flush=True)
+                _, first, total = chat_stream(
+                    session,
+                    url,
+                    user_input,
+                    on_token=lambda token: print(token, end="", flush=True),
+                    session_id=session_id,
+                )
+                ttft = "-" if first is None else f"{first:.2f}s"
+                print(f"\n(first token {ttft}, total {total:.2f}s)")
+            else:
+                reply, _, _ = chat(session, url, user_input, session_id)
+                print("Bot:", reply)
+        except (requests.RequestException, RuntimeError) as e:
+            print(f"\n[error] {e}")
+
+
+def _percentile(values, p):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1]
+
+
+def run_prompts(session, url, prompts, concurrency, stream):
+    """プロンプトを並列に送り、1 件ごとのレイテンシと全体のスループットを表示する。
+
+    エラーが 1 件でもあれば 1 を返す。
+    """
+    send = chat_stream if stream else chat
+
+    def one(prompt):
+        try:
+            _, first, total = send(session, url, prompt)
+            return None, first, total
+        except (requests.RequestException, RuntimeError) as e:
+            return str(e), None, None
+
+    latencies = []
+    ttfts = []
+    errors = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(one, prompt): i for i, prompt in enumerate(prompts)}
+        for future in as_completed(futures):
+            i = futures[future]
+            error, first, total = future.result()
+            if error is not None:
+                errors += 1
+                print(f"[{i:>4}] error {error}")
+                continue
+            latencies.append(total)
+            line = f"[{i:>4}] {total * 1000:8.1f} ms"
+            if first is not None:
+                ttfts.append(first)
+                line += f"  first token {first * 1000:8.1f} ms"
+            print(line, flush=True)
+    elapsed = time.perf_counter() - start
+
+    print()
+    print(f"requests:    {len(prompts)} ({errors} errors)")
+    print(f"concurrency: {concurrency}")
+    print(f"elapsed:     {elapsed:.2f} s")
+    print(f"throughput:  {len(latencies) / elapsed:.2f} req/s")
+    if latencies:
+        latencies.sort()
+        print(
+            "latency:     "
+            f"mean {statistics.fmean(latencies) * 1000:.1f} ms, "
+            f"p50 {_percentile(latencies, 50) * 1000:.1f} ms, "
+            f"p99 {_percentile(latencies, 99) * 1000:.1f} ms"
+        )
+    if ttfts:
+        ttfts.sort()
+        print(
+            "first token: "
+            f"p50 {_percentile(ttfts, 50) * 1000:.1f} ms, "
+            f"p99 {_percentile(ttfts, 99) * 1000:.1f} ms"
+        )
+    return 1 if errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sample2 chat client")
+    parser.add_argument("--url", default=URL, help=f"API server (default: {URL})")
+    parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="Wait for the whole reply instead of streaming tokens",
+    )
+    parser.add_argument(
+        "--session",
+        action="store_true",
+        help="Keep the conversation history on the server (interactive mode)",
+    )
+    parser.add_argument(
+        "--prompts",
+        metavar="FILE",
+        help="Send each line of FILE as a prompt and report latency/throughput",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Prompts in flight with --prompts (default: 1)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Send the prompt file this many times (default: 1)",
+    )
+    args = parser.parse_args()
+
+    if args.prompts is None:
+        with make_session() as session:
+            session_id = create_session(session, args.url) if args.session else None
+            interactive(session, args.url, not args.no_stream, session_id)
+        return 0
+
+    with open(args.prompts, encoding="utf-8") as f:
+        prompts = [line.strip() for line in f if line.strip()] * args.repeat
+    if not prompts:
+        parser.error(f"no prompts in {args.prompts}")
+    with make_session(args.concurrency) as session:
+        return run_prompts(
+            session, args.url, prompts, args.concurrency, not args.no_stream
+        )
+
 
-while True:
-    user_input = input("You: ")
-    if user_input.lower() in ["exit", "quit"]:
-        break
-    res = requests.post("http://localhost:8000/chat", json={"message": user_input})
-    print("Bot:", res.json()["reply"])
+if __name__ == "__main__":
+    raise SystemExit(main())
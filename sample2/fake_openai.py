@@ -0,0 +1,152 @@
+"""検証用の OpenAI 互換フェイクサーバ。
+
+  $ uv run uvicorn fake_openai:app --port 9000
+  $ export OPENAI_BASE_URL=http://127.0.0.1:9000/v1 OPENAI_API_KEY=dummy
+
+POST /v1/chat/completions に、FAKE_LATENCY 秒 (既定 0.5) 待ってから
+最後のユーザーメッセージをそのまま返す。トークン数は空白区切りの語数で数える。
+stream=true の場合は、最初の語を FAKE_LATENCY 秒後に、以降の語を
+FAKE_TOKEN_INTERVAL 秒 (既定 0.05) ごとに SSE で返す。
+FAKE_RATE_LIMIT (1 秒あたりのリクエスト数) を指定すると、それを超えた
+リクエストに 429 を返す。
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY = float(os.getenv("FAKE_LATENCY", "0.5"))
+TOKEN_INTERVAL = float(os.getenv("FAKE_TOKEN_INTERVAL", "0.05"))
+RATE_LIMIT = float(os.getenv("FAKE_RATE_LIMIT", "0"))
+
+app = FastAPI()
+
+
+class _TokenBucket:
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+_bucket = _TokenBucket(RATE_LIMIT) if RATE_LIMIT > 0 else None
+
+
+def _count_tokens(text):
+    return len(text.split())
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    if _bucket is not None and not _bucket.take():
+        return JSONResponse(
+            {
+                "error": {
+                    "message": "Rate limit exceeded",
+                    "type": "rate_limit_error",
+                    "code": 429,
+                }
+            },
+            status_code=429,
+            headers={"Retry-After": "1"},
+        )
+
+    data = await request.json()
+    messages = data.get("messages", [])
+    user_input = next(
+        (m["content"] for m in reversed(messages) if m.get("role") == "user"), ""
+    )
+    reply = f"echo: {user_input}"
+    if data.get("max_tokens"):
+        # 本物の API と同じく、max_tokens で応答を打ち切る
+        reply = " ".join(reply.split(" ")[: data["max_tokens"]])
+    prompt_tokens = sum(_count_tokens(str(m.get("content", ""))) for m in messages)
+    completion_tokens = _count_tokens(reply)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = data.get("model", "fake")
+
+    if data.get("stream"):
+        return StreamingResponse(
+            _stream(
+                completion_id,
+                created,
+                model,
+                reply,
+                (
+                    _usage(prompt_tokens, completion_tokens)
+                    if (data.get("stream_options") or {}).get("include_usage")
+                    else None
+                ),
+            ),
+            media_type="text/event-stream",
+        )
+
+    await asyncio.sleep(LATENCY)
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": _usage(prompt_tokens, completion_tokens),
+    }
+
+
+def _usage(prompt_tokens, completion_tokens):
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+async def _stream(completion_id, created, model, reply, usage=None):
+    def chunk(delta, finish_reason=None, choices=True, usage=None):
+        data = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": (
+                [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                if choices
+                else []
+            ),
+        }
+        if usage is not None:
+            data["usage"] = usage
+        return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    await asyncio.sleep(LATENCY)
+    yield chunk({"role": "assistant", "content": ""})
+    for i, word in enumerate(reply.split(" ")):
+        if i:
+            await asyncio.sleep(TOKEN_INTERVAL)
+        yield chunk({"content": word if i == 0 else " " + word})
+    yield chunk({}, "stop")
+    if usage is not None:
+        # stream_options.include_usage: choices が空で usage だけのチャンク
+        yield chunk({}, choices=False, usage=usage)
+    yield "data: [DONE]\n\n"
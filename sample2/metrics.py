@@ -0,0 +1,178 @@
+"""Prometheus テキスト形式で公開する最小限のメトリクス。
+
+``Counter`` / ``Gauge`` / ``Histogram`` をモジュールの ``REGISTRY`` に登録し、
+``REGISTRY.render()`` で ``/metrics`` の本文を作る。値はイベントループの
+スレッドからだけ更新する前提で、ロックは取らない。
+"""
+
+import math
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 秒単位のレイテンシ向けのバケット (上流の LLM は数十秒かかることもある)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{_escape(v)}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """``inc`` で増やすか、``fn`` を渡して収集のたびに値を読む (ラベルなし)。"""
+
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=(), fn=None, registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self._fn = fn
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        if self._fn is not None:
+            yield f"{self.name} {_format_value(self._fn())}"
+            return
+        for key, value in self._values.items():
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """収集のたびに ``fn`` を呼んで値を読む。"""
+
+    type = "gauge"
+
+    def __init__(self, name, help, fn, registry=REGISTRY):
+        super().__init__(name, help, (), registry)
+        self._fn = fn
+
+    def samples(self):
+        yield f"{self.name} {_format_value(self._fn())}"
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self, name, help, labelnames=(), buckets=LATENCY_BUCKETS, registry=REGISTRY
+    ):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # [バケットごとの件数..., 合計, 件数]
+            state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[i] += 1
+                break
+        state[-2] += value
+        state[-1] += 1
+
+    def samples(self):
+        for key, state in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                labels = _format_labels(
+                    self.labelnames, key, [("le", _format_value(bound))]
+                )
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(state[-2])}"
+            yield f"{self.name}_count{labels} {state[-1]}"
+
+
+class MetricsMiddleware:
+    """リクエスト数とレイテンシを記録する ASGI ミドルウェア。
+
+    レスポンス本文を送り終えるまでを計るので、ストリーミング応答でも
+    最初のバイトではなく全体の時間になる。パスはルートのテンプレートで
+    まとめ、未知のパスは ``other`` にする。
+    """
+
+    def __init__(self, app, requests_total, request_latency):
+        self.app = app
+        self.requests_total = requests_total
+        self.request_latency = request_latency
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "other")
+            self.request_latency.observe(time.perf_counter() - start, path=path)
+            self.requests_total.inc(
+                path=path, method=scope["method"], status=str(status)
+            )
@@ -0,0 +1,129 @@
+"""サーバ側で会話履歴を持つセッション。
+
+クライアントは ``session_id`` だけを送り、履歴はサーバが持つ。履歴は
+1 往復を ``(user, assistant, tokens)`` のタプル 1 つで持ち、トークン数は
+追加時に 1 度だけ見積もる。上流を呼ぶ前に、新しい往復から順に
+トークン予算に収まる分だけを使い、収まらない古い往復は捨てる
+(要約する場合は ``Session.summary`` に畳み込む)。
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+# メッセージ 1 件ごとに role などで増える分
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text):
+    """トークン数のおおよその見積もり。
+
+    英数字はおよそ 4 文字で 1 トークン、日本語などそれ以外は 1 文字で
+    1 トークンとして数える (tokenizer を使わずに済ませるため)。
+    """
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (ascii_chars + 3) // 4 + len(text) - ascii_chars + MESSAGE_OVERHEAD
+
+
+class Session:
+    __slots__ = ("id", "turns", "tokens", "summary", "summary_tokens", "lock")
+
+    def __init__(self, session_id):
+        self.id = session_id
+        # (user, assistant, tokens)。末尾ほど新しい
+        self.turns = deque()
+        self.tokens = 0
+        self.summary = ""
+        self.summary_tokens = 0
+        # 同じセッションの往復は順番に処理する
+        self.lock = asyncio.Lock()
+
+    def add(self, user, assistant):
+        tokens = estimate_tokens(user) + estimate_tokens(assistant)
+        self.turns.append((user, assistant, tokens))
+        self.tokens += tokens
+
+    def set_summary(self, summary):
+        self.summary = summary
+        self.summary_tokens = estimate_tokens(summary) if summary else 0
+
+    def trim(self, budget, target):
+        """履歴が ``budget`` を超えていたら ``target`` 以下になるまで古い往復を捨てる。
+
+        捨てた往復のリストを返す。一度に ``target`` まで減らすので、
+        要約は毎回ではなく予算を超えたときにまとめて行われる。
+        """
+        if self.summary_tokens + self.tokens <= budget:
+            return []
+        dropped = []
+        while self.turns and self.summary_tokens + self.tokens > target:
+            turn = self.turns.popleft()
+            self.tokens -= turn[2]
+            dropped.append(turn)
+        return dropped
+
+    def messages(self, system_prompt, user_input):
+        messages = [{"role": "system", "content": system_prompt}]
+        if self.summary:
+            messages.append(
+                {
+                    "role": "system",
+                    "content": f"これまでの会話の要約: {self.summary}",
+                }
+            )
+        for user, assistant, _ in self.turns:
+            messages.append({"role": "user", "content": user})
+            messages.append({"role": "assistant", "content": assistant})
+        messages.append({"role": "user", "content": user_input})
+        return messages
+
+    def to_dict(self):
+        return {
+            "session_id": self.id,
+            "summary": self.summary,
+            "turns": [{"user": u, "assistant": a} for u, a, _ in self.turns],
+            "tokens": self.summary_tokens + self.tokens,
+        }
+
+
+class SessionStore:
+    """プロセス内のセッション置き場 (件数上限つきの LRU と、最終利用からの TTL)。"""
+
+    def __init__(self, maxsize=10_000, ttl=3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        # id -> (expires_at, Session)。末尾ほど最近使ったもの
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self):
+        return self.get(uuid.uuid4().hex)
+
+    def get(self, session_id, create=True):
+        """セッションを返す。無いか期限切れなら ``create`` のとき新しく作る。"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(session_id)
+            if entry is not None and entry[0] > now:
+                session = entry[1]
+            elif create:
+                session = Session(session_id)
+            else:
+                self._data.pop(session_id, None)
+                return None
+            self._data[session_id] = (now + self.ttl, session)
+            self._data.move_to_end(session_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return session
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._data.pop(session_id, None) is not None
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,124 @@
+"""上流 LLM 呼び出しの流量制御。
+
+- ``SingleFlight``: 同じキーの同時リクエストを 1 回の上流呼び出しにまとめる
+- ``AdmissionQueue``: 上流への同時呼び出し数を制限し、待ち行列が一杯なら
+  ``QueueFull`` ですぐに断る (バックプレッシャー)
+- ``retry_with_jitter``: 429 や一時的なエラーを、指数バックオフ +
+  full jitter で再試行する
+"""
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+
+import openai
+
+# 再試行する例外: レート制限 (429)、接続エラー・タイムアウト、5xx
+RETRYABLE = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class QueueFull(Exception):
+    """待ち行列が一杯で、リクエストを受け付けられない。"""
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        # 実行中の呼び出しに相乗りした回数
+        self.shared = 0
+
+    @property
+    def in_flight(self):
+        return len(self._flights)
+
+    async def do(self, key, fn):
+        """``fn()`` を実行して結果を返す。
+
+        同じ ``key`` の呼び出しが実行中なら、新たに実行せずその結果を待つ。
+        最初の呼び出し元が切断されても、待っている他の呼び出し元のために
+        実行は続ける。
+        """
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        self._flights.pop(key, None)
+        # 呼び出し元が全員キャンセルしていても、例外を未処理として記録しない
+        if not task.cancelled():
+            task.exception()
+
+
+class AdmissionQueue:
+    def __init__(self, concurrency, max_waiting):
+        self.concurrency = concurrency
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def full(self):
+        return self._semaphore.locked() and self.waiting >= self.max_waiting
+
+    @asynccontextmanager
+    async def slot(self):
+        """上流を呼ぶ枠を確保する。待ち時間 (秒) を返す。"""
+        if self.full():
+            self.rejected += 1
+            raise QueueFull()
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield time.perf_counter() - start
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after", ""))
+    except ValueError:
+        return None
+
+
+async def retry_with_jitter(fn, retries=3, base=0.5, cap=8.0, on_retry=None):
+    """``fn()`` を実行し、``RETRYABLE`` な例外なら最大 ``retries`` 回再試行する。
+
+    待ち時間は 0 から ``min(cap, base * 2**attempt)`` の一様乱数
+    (full jitter) で、一斉に再試行して再びレート制限に当たるのを避ける。
+    上流が Retry-After を返した場合はそれより短くは待たない。
+    ``on_retry`` は再試行の前に例外を渡して呼ばれる。
+    """
+    for attempt in range(retries + 1):
+        try:
+            return await fn()
+        except RETRYABLE as e:
+            if attempt == retries:
+                raise
+            if on_retry is not None:
+                on_retry(e)
+            delay = random.uniform(0, min(cap, base * 2**attempt))
+            retry_after = _retry_after(e)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, cap))
+            await asyncio.sleep(delay)
@@ -10,13 +10,18 @@ from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google.genai import types  # For creating message Content/Parts
 
-from .tools.weather import get_weather, get_weather_stateful  # Import the weather tool
+from .tools.weather import (
+    get_weather,
+    get_weather_batch,
+    get_weather_stateful,
+    weather_provider,
+)  # Import the weather tools and the cached weather provider
 from .tools.greeting import say_hello, say_goodbye  # Import greeting tools
 from .callbacks.before_llm import (
     block_keyword_guardrail,
 )  # Import the guardrail callback
 from .callbacks.before_tool import (
-    block_paris_tool_guardrail,
+    tool_policy_guardrail,
 )  # Import the tool guardrail callback
 
 # Ignore all warnings
@@ -112,18 +117,22 @@ if greeting_agent and farewell_agent and "get_weather" in globals():
         name="weather_agent_v2",  # Give it a new version name
         model=root_agent_model,
         description="Main agent: Provides weather (state-aware unit), delegates greetings/farewells, saves report to state.",
-        instruction="You are the main Weather Agent. Your job is to provide weather using 'get_weather_stateful'. "
-        "The tool will format the temperature based on user preference stored in state. "
+        instruction="You are the main Weather Agent. Your job is to provide weather using 'get_weather_batch'. "
+        "Always call 'get_weather_batch' ONCE with every city the user asks about (e.g. ['London', 'Tokyo', 'New York']), "
+        "never one tool call per city. Use 'get_weather_stateful' only if 'get_weather_batch' is unavailable. "
+        "The tools will format the temperature based on user preference stored in state. "
+        "Report each city's result, including any per-city errors. "
         "Delegate simple greetings to 'greeting_agent' and farewells to 'farewell_agent'. "
         "Handle only weather requests, greetings, and farewells.",
         tools=[
+            get_weather_batch,
             get_weather_stateful,
-        ],  # Root agent still needs the weather tool for its core task
+        ],  # Root agent still needs the weather tools for its core task (batch preferred)
         # Key change: Link the sub-agents here!
         sub_agents=[greeting_agent, farewell_agent],
         output_key="last_weather_report",  # Save last report to state
         before_model_callback=block_keyword_guardrail,  # Attach the guardrail callback
-        before_tool_callback=block_paris_tool_guardrail,  # Attach the tool guardrail callback
+        before_tool_callback=tool_policy_guardrail,  # Attach the tool guardrail callback
     )
     print(
         f"✅ Root Agent '{weather_agent_team.name}' created using model '{root_agent_model}' with sub-agents: {[sa.name for sa in weather_agent_team.sub_agents]}"
@@ -331,6 +340,7 @@ if __name__ == "__main__":  # Ensures this runs only when script is executed dir
             print(
                 f"Final Last City Checked (by tool): {final_session.state.get('last_city_checked_stateful', 'Not Set')}"
             )
+            print(f"Weather Cache Stats: {weather_provider.stats()}")
             # Print full state for detailed view
             # print(f"Full State Dict: {final_session.state}") # For detailed view
         else:
@@ -6,14 +6,28 @@ from google.adk.models.llm_request import LlmRequest
 from google.adk.models.llm_response import LlmResponse
 from google.genai import types  # For creating response content
 from typing import Optional
+import os
+
+from .guardrail_engine import DEFAULT_POLICY_PATH, GuardrailEngine
+
+# Compile the policy once at startup; each check is then a single regex scan
+# whose cost hardly grows with the number of blocked terms.
+guardrail_engine = GuardrailEngine.from_file(
+    os.getenv("GUARDRAIL_POLICY_PATH", DEFAULT_POLICY_PATH)
+)
+print(
+    f"✅ Guardrail policy compiled: {len(guardrail_engine.rules)} rules, "
+    f"{guardrail_engine.stats()['terms']} terms."
+)
 
 
 def block_keyword_guardrail(
     callback_context: CallbackContext, llm_request: LlmRequest
 ) -> Optional[LlmResponse]:
     """
-    Inspects the latest user message for 'BLOCK'. If found, blocks the LLM call
-    and returns a predefined LlmResponse. Otherwise, returns None to proceed.
+    Inspects the latest user message against the guardrail policy (blocked
+    terms such as 'BLOCK', and regex patterns). If a rule matches, blocks the
+    LLM call and returns that rule's LlmResponse. Otherwise, returns None to proceed.
     """
     agent_name = (
         callback_context.agent_name
@@ -23,12 +37,13 @@ def block_keyword_guardrail(
     # Extract the text from the latest user message in the request history
     last_user_message_text = ""
     if llm_request.contents:
-        # Find the most recent message with role 'user'
+        # Find the most recent message with role 'user' that has text
         for content in reversed(llm_request.contents):
             if content.role == "user" and content.parts:
-                # Assuming text is in the first part for simplicity
-                if content.parts[0].text:
-                    last_user_message_text = content.parts[0].text
+                # Join every text part so that one scan covers all of them
+                texts = [part.text for part in content.parts if part.text]
+                if texts:
+                    last_user_message_text = "\n".join(texts)
                     break  # Found the last user message text
 
     print(
@@ -36,29 +51,32 @@ def block_keyword_guardrail(
     )  # Log first 100 chars
 
     # --- Guardrail Logic ---
-    keyword_to_block = "BLOCK"
-    if keyword_to_block in last_user_message_text.upper():  # Case-insensitive check
-        print(f"--- Callback: Found '{keyword_to_block}'. Blocking LLM call! ---")
+    verdict = guardrail_engine.check(last_user_message_text)  # Case-insensitive check
+    print(
+        f"--- Callback: Guardrail check took {verdict.elapsed_ms:.3f} ms "
+        f"(stats: {guardrail_engine.stats()}) ---"
+    )
+    if verdict.blocked:
+        print(
+            f"--- Callback: Rule '{verdict.rule.id}' matched '{verdict.match}'. Blocking LLM call! ---"
+        )
         # Optionally, set a flag in state to record the block event
         callback_context.state["guardrail_block_keyword_triggered"] = True
+        callback_context.state["guardrail_block_rule"] = verdict.rule.id
         print(f"--- Callback: Set state 'guardrail_block_keyword_triggered': True ---")
 
         # Construct and return an LlmResponse to stop the flow and send this back instead
         return LlmResponse(
             content=types.Content(
                 role="model",  # Mimic a response from the agent's perspective
-                parts=[
-                    types.Part(
-                        text=f"I cannot process this request because it contains the blocked keyword '{keyword_to_block}'."
-                    )
-                ],
+                parts=[types.Part(text=verdict.message())],
             )
             # Note: You could also set an error_message field here if needed
         )
     else:
         # Keyword not found, allow the request to proceed to the LLM
         print(
-            f"--- Callback: Keyword not found. Allowing LLM call for {agent_name}. ---"
+            f"--- Callback: No guardrail rule matched. Allowing LLM call for {agent_name}. ---"
         )
         return None  # Returning None signals ADK to continue normally
 
@@ -4,56 +4,74 @@
 from google.adk.tools.base_tool import BaseTool
 from google.adk.tools.tool_context import ToolContext
 from typing import Optional, Dict, Any  # For type hints
+import os
 
+from ..tools.weather import weather_data
+from ..tools.weather_data import normalize_city
+from .tool_policy import DEFAULT_POLICY_PATH, ToolPolicy
 
-def block_paris_tool_guardrail(
+
+def canonical_city(value: Any) -> str:
+    """Normalizes a city the way the weather tools look it up.
+
+    A known city or alias resolves to its canonical name ("NYC" -> New
+    York); case, accents and punctuation are ignored ("París", "PARIS!").
+    """
+    text = str(value)
+    city = weather_data.lookup(text)
+    return normalize_city(city.name if city is not None else text)
+
+
+# Load the policy once; rules are compiled per tool name, and the file is
+# re-read when it changes (checked at most once per reload interval).
+# Rules with "normalize": "city" compare values with canonical_city.
+tool_policy = ToolPolicy(
+    os.getenv("TOOL_POLICY_PATH", DEFAULT_POLICY_PATH),
+    reload_interval=float(os.getenv("TOOL_POLICY_RELOAD_INTERVAL", "1.0")),
+    normalizers={"city": canonical_city},
+)
+print(f"✅ Tool policy loaded: {tool_policy.stats()}")
+
+
+def tool_policy_guardrail(
     tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext
 ) -> Optional[Dict]:
     """
-    Checks if 'get_weather_stateful' is called for 'Paris'.
-    If so, blocks the tool execution and returns a specific error dictionary.
+    Checks the tool call against the rules for this tool in the tool policy
+    (e.g. 'get_weather_stateful' is not allowed for 'Paris').
+    If a rule is violated, blocks the tool execution and returns an error dictionary.
     Otherwise, allows the tool call to proceed by returning None.
     """
     tool_name = tool.name
     agent_name = tool_context.agent_name  # Agent attempting the tool call
     print(
-        f"--- Callback: block_paris_tool_guardrail running for tool '{tool_name}' in agent '{agent_name}' ---"
+        f"--- Callback: tool_policy_guardrail running for tool '{tool_name}' in agent '{agent_name}' ---"
     )
     print(f"--- Callback: Inspecting args: {args} ---")
 
     # --- Guardrail Logic ---
-    target_tool_name = (
-        "get_weather_stateful"  # Match the function name used by FunctionTool
-    )
-    blocked_city = "paris"
-
-    # Check if it's the correct tool and the city argument matches the blocked city
-    if tool_name == target_tool_name:
-        city_argument = args.get("city", "")  # Safely get the 'city' argument
-        if city_argument and city_argument.lower() == blocked_city:
-            print(
-                f"--- Callback: Detected blocked city '{city_argument}'. Blocking tool execution! ---"
-            )
-            # Optionally update state
-            tool_context.state["guardrail_tool_block_triggered"] = True
-            print(f"--- Callback: Set state 'guardrail_tool_block_triggered': True ---")
-
-            # Return a dictionary matching the tool's expected output format for errors
-            # This dictionary becomes the tool's result, skipping the actual tool run.
-            return {
-                "status": "error",
-                "error_message": f"Policy restriction: Weather checks for '{city_argument.capitalize()}' are currently disabled by a tool guardrail.",
-            }
-        else:
-            print(
-                f"--- Callback: City '{city_argument}' is allowed for tool '{tool_name}'. ---"
-            )
-    else:
-        print(f"--- Callback: Tool '{tool_name}' is not the target tool. Allowing. ---")
-
-    # If the checks above didn't return a dictionary, allow the tool to execute
+    # Only the rules registered for this tool name are evaluated
+    violation = tool_policy.check(tool_name, args)
+    if violation is not None:
+        rule, value = violation
+        print(
+            f"--- Callback: Rule '{rule.id}' violated by {rule.arg}={value!r}. Blocking tool execution! ---"
+        )
+        # Optionally update state
+        tool_context.state["guardrail_tool_block_triggered"] = True
+        tool_context.state["guardrail_tool_block_rule"] = rule.id
+        print(f"--- Callback: Set state 'guardrail_tool_block_triggered': True ---")
+
+        # Return a dictionary matching the tool's expected output format for errors
+        # This dictionary becomes the tool's result, skipping the actual tool run.
+        return {
+            "status": "error",
+            "error_message": rule.message_for(tool_name, value),
+        }
+
+    # If no rule was violated, allow the tool to execute
     print(f"--- Callback: Allowing tool '{tool_name}' to proceed. ---")
     return None  # Returning None allows the actual tool function to run
 
 
-print("✅ block_paris_tool_guardrail function defined.")
+print("✅ tool_policy_guardrail function defined.")
@@ -0,0 +1,127 @@
+# @title Guardrail engine for the before_model_callback
+import json
+import os
+import re
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+# Bundled policy; set GUARDRAIL_POLICY_PATH to use another file.
+DEFAULT_POLICY_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "data", "llm_guardrail.json"
+)
+
+
+class Rule(NamedTuple):
+    id: str
+    message: str  # "{match}" is replaced with what matched
+
+
+class Verdict(NamedTuple):
+    rule: Optional[Rule]  # None if the text is allowed
+    match: Optional[str]
+    elapsed_ms: float
+
+    @property
+    def blocked(self) -> bool:
+        return self.rule is not None
+
+    def message(self) -> str:
+        return self.rule.message.replace("{match}", self.match or "")
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """Builds a regex that matches any of ``terms``, factored as a prefix trie.
+
+    A flat ``a|b|c|...`` alternation retries every term at each position;
+    the trie form only follows branches that share the text's next
+    character, so adding terms barely changes the cost of a scan.
+    """
+    trie: Dict[str, dict] = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}  # End of a term
+
+    def render(node: Dict[str, dict]) -> str:
+        branches = [re.escape(ch) + render(child) for ch, child in node.items() if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # A term may end here, so the longer continuations are optional.
+        return f"(?:{body})?" if "" in node else body
+
+    return render(trie)
+
+
+class GuardrailEngine:
+    """Checks text against a policy compiled once into a single regex.
+
+    A policy is a list of rules, each with literal ``terms`` and/or regex
+    ``patterns``. All terms go into one trie-shaped alternation and each
+    rule's patterns into a named group, so one scan of the text checks every
+    rule. Matching is case-insensitive: the text is lower-cased before the
+    scan, so patterns should be written in lower case.
+    """
+
+    def __init__(self, rules: List[dict]):
+        self.rules: List[Rule] = []
+        self._terms: Dict[str, Rule] = {}  # lower-cased term -> rule
+        self._term_labels: Dict[str, str] = {}  # lower-cased term -> term as written
+        groups = []
+        patterns: Dict[str, Rule] = {}
+        for i, spec in enumerate(rules):
+            rule = Rule(spec["id"], spec["message"])
+            self.rules.append(rule)
+            for term in spec.get("terms", []):
+                self._terms.setdefault(term.lower(), rule)
+                self._term_labels.setdefault(term.lower(), term)
+            if spec.get("patterns"):
+                group = f"p{i}"
+                patterns[group] = rule
+                groups.append(f"(?P<{group}>{'|'.join(spec['patterns'])})")
+        if self._terms:
+            groups.insert(0, f"(?P<terms>{_trie_pattern(self._terms)})")
+        self._patterns = patterns
+        self._regex = re.compile("|".join(groups)) if groups else None
+
+        self.checks = 0
+        self.blocked = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    @classmethod
+    def from_file(cls, path: str) -> "GuardrailEngine":
+        """Loads a JSON policy: ``{"rules": [{"id", "message", "terms", "patterns"}]}``."""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f)["rules"])
+
+    def check(self, text: str) -> Verdict:
+        """Scans ``text`` once and returns the first rule that matches, if any."""
+        start = time.perf_counter()
+        rule = match = None
+        found = self._regex.search(text.lower()) if self._regex else None
+        if found is not None:
+            if found.lastgroup == "terms":
+                rule = self._terms[found.group()]
+                match = self._term_labels[found.group()]
+            else:
+                rule = self._patterns[found.lastgroup]
+                match = found.group()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.checks += 1
+        self.blocked += rule is not None
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        return Verdict(rule, match, elapsed_ms)
+
+    def stats(self) -> dict:
+        return {
+            "rules": len(self.rules),
+            "terms": len(self._terms),
+            "checks": self.checks,
+            "blocked": self.blocked,
+            "mean_ms": self.total_ms / self.checks if self.checks else 0.0,
+            "max_ms": self.max_ms,
+        }
@@ -0,0 +1,174 @@
+# @title Tool policy engine for the before_tool_callback
+import json
+import os
+import re
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+# Bundled policy; set TOOL_POLICY_PATH to use another file.
+DEFAULT_POLICY_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "data", "tool_policy.json"
+)
+
+
+def _normalize(value: Any) -> str:
+    return str(value).strip().casefold()
+
+
+Normalizers = Dict[str, Callable[[Any], str]]
+
+
+def _compile_predicate(spec: dict, normalizers: Normalizers) -> Callable[[Any], bool]:
+    """Turns one rule's condition into a function of a single argument value.
+
+    Supported conditions (case-insensitive):
+      "in": [...]       the value is one of the listed values
+      "matches": "re"   the regex matches somewhere in the value
+
+    An "in" rule may name a normalizer, e.g. "normalize": "city", to compare
+    both sides through one of the functions passed to ToolPolicy instead.
+    """
+    if "in" in spec:
+        if "normalize" in spec:
+            if spec["normalize"] not in normalizers:
+                raise ValueError(
+                    f"Rule {spec.get('id')!r} has an unknown normalizer {spec['normalize']!r}"
+                )
+            normalize = normalizers[spec["normalize"]]
+        else:
+            normalize = _normalize
+        values = frozenset(normalize(v) for v in spec["in"])
+        return lambda value: normalize(value) in values
+    if "matches" in spec:
+        regex = re.compile(spec["matches"], re.IGNORECASE)
+        return lambda value: regex.search(str(value)) is not None
+    raise ValueError(f"Rule {spec.get('id')!r} has no condition ('in' or 'matches')")
+
+
+class ToolRule(NamedTuple):
+    id: str
+    arg: str
+    predicate: Callable[[Any], bool]
+    message: str  # "{tool}", "{arg}" and "{value}" are filled in
+
+    def violation(self, args: Dict[str, Any]) -> Optional[Any]:
+        """Returns the offending value, or None if the call is allowed.
+
+        For list arguments (e.g. a batch of cities) any matching element counts.
+        """
+        value = args.get(self.arg)
+        if value is None:
+            return None
+        for item in value if isinstance(value, (list, tuple)) else (value,):
+            if self.predicate(item):
+                return item
+        return None
+
+    def message_for(self, tool_name: str, value: Any) -> str:
+        return (
+            self.message.replace("{tool}", tool_name)
+            .replace("{arg}", self.arg)
+            .replace("{value}", str(value))
+        )
+
+
+class ToolPolicy:
+    """Per-tool rules loaded from a JSON file, recompiled when the file changes.
+
+    The file maps tool names to lists of rules; rules under "*" apply to
+    every tool. Rules are compiled once per load, so checking a call is a
+    dict lookup by tool name plus that tool's rules only. The file's mtime
+    is checked at most every ``reload_interval`` seconds; a file that fails
+    to load leaves the previous policy in place. ``normalizers`` are the
+    functions rules can name with "normalize" (e.g. {"city": ...}).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        reload_interval: float = 1.0,
+        normalizers: Optional[Normalizers] = None,
+    ):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.normalizers = normalizers or {}
+        self.loads = 0
+        self._rules: Dict[str, Tuple[ToolRule, ...]] = {}
+        self._default: Tuple[ToolRule, ...] = ()
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self.reload_if_changed(force=True)
+
+    def compile(self, config: Any) -> Tuple[Dict[str, Tuple[ToolRule, ...]], tuple]:
+        # Valid JSON of the wrong shape must fail like a syntax error does,
+        # so a bad edit keeps the previous rules instead of breaking calls.
+        if not isinstance(config, dict) or not isinstance(
+            config.get("tools", {}), dict
+        ):
+            raise ValueError('The policy must be an object with a "tools" object')
+        for tool, specs in config.get("tools", {}).items():
+            if not isinstance(specs, list) or not all(
+                isinstance(spec, dict) for spec in specs
+            ):
+                raise ValueError(f"Rules for {tool!r} must be a list of objects")
+        compiled = {
+            tool: tuple(
+                ToolRule(
+                    spec["id"],
+                    spec["arg"],
+                    _compile_predicate(spec, self.normalizers),
+                    spec["message"],
+                )
+                for spec in specs
+            )
+            for tool, specs in config.get("tools", {}).items()
+        }
+        default = compiled.pop("*", ())
+        # Fold the "*" rules into each tool so a check needs a single lookup.
+        return {tool: rules + default for tool, rules in compiled.items()}, default
+
+    def reload_if_changed(self, force: bool = False) -> bool:
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        self._next_check = now + self.reload_interval
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if not force and mtime == self._mtime:
+                return False
+            # Remember the mtime first so a broken file is reported once, not
+            # on every check, and is retried when it is edited again.
+            self._mtime = mtime
+            with open(self.path, encoding="utf-8") as f:
+                self._rules, self._default = self.compile(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError, re.error) as e:
+            if self.loads == 0:
+                raise  # No previous policy to fall back on
+            print(
+                f"--- Tool policy: reload of '{self.path}' failed, keeping the old rules: {e} ---"
+            )
+            return False
+        self.loads += 1
+        return True
+
+    def rules_for(self, tool_name: str) -> Tuple[ToolRule, ...]:
+        return self._rules.get(tool_name, self._default)
+
+    def check(
+        self, tool_name: str, args: Dict[str, Any]
+    ) -> Optional[Tuple[ToolRule, Any]]:
+        """Returns (rule, offending value) for the first violated rule, or None."""
+        if self.reload_if_changed():
+            print(f"--- Tool policy: reloaded '{self.path}' ---")
+        for rule in self.rules_for(tool_name):
+            value = rule.violation(args)
+            if value is not None:
+                return rule, value
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "tools": len(self._rules),
+            "default_rules": len(self._default),
+            "loads": self.loads,
+        }
@@ -1,5 +1,42 @@
+import asyncio
+import os
+from typing import List
+
 from google.adk.tools.tool_context import ToolContext
 
+from .weather_data import DEFAULT_DATA_PATH, WeatherData
+from .weather_provider import (
+    CachedWeatherProvider,
+    FakeWeatherProvider,
+    LocalWeatherProvider,
+)
+
+# Load the weather data once at startup; every tool call is then a dict lookup.
+weather_data = WeatherData.load(os.getenv("WEATHER_DATA_PATH", DEFAULT_DATA_PATH))
+print(f"✅ Weather data loaded: {len(weather_data)} cities.")
+
+
+def _make_weather_provider() -> CachedWeatherProvider:
+    """Builds the backend chosen by WEATHER_PROVIDER ('local' or 'fake') behind a cache."""
+    backend = os.getenv("WEATHER_PROVIDER", "local")
+    if backend == "local":
+        provider = LocalWeatherProvider(weather_data)
+    elif backend == "fake":
+        # Simulates a remote service so the cache and coalescing can be observed
+        latency = float(os.getenv("WEATHER_FAKE_LATENCY", "0.2"))
+        provider = FakeWeatherProvider(weather_data, latency)
+    else:
+        raise ValueError(f"Unknown WEATHER_PROVIDER: {backend!r}")
+    return CachedWeatherProvider(
+        provider,
+        ttl=float(os.getenv("WEATHER_CACHE_TTL", "600")),
+        negative_ttl=float(os.getenv("WEATHER_CACHE_NEGATIVE_TTL", "60")),
+    )
+
+
+weather_provider = _make_weather_provider()
+print(f"✅ Weather provider: {type(weather_provider.provider).__name__} (cached).")
+
 
 # @title Define the get_weather Tool
 def get_weather(city: str) -> dict:
@@ -15,26 +52,15 @@ def get_weather(city: str) -> dict:
               If 'error', includes an 'error_message' key.
     """
     print(f"--- Tool: get_weather called for city: {city} ---")  # Log tool execution
-    city_normalized = city.lower().replace(" ", "")  # Basic normalization
 
-    # Mock weather data
-    mock_weather_db = {
-        "newyork": {
-            "status": "success",
-            "report": "The weather in New York is sunny with a temperature of 25°C.",
-        },
-        "london": {
-            "status": "success",
-            "report": "It's cloudy in London with a temperature of 15°C.",
-        },
-        "tokyo": {
+    # Aliases and diacritics are handled by the index ("NYC", "Sao Paulo", ...)
+    data = weather_data.lookup(city)
+    if data is not None:
+        return {
             "status": "success",
-            "report": "Tokyo is experiencing light rain and a temperature of 18°C.",
-        },
-    }
-
-    if city_normalized in mock_weather_db:
-        return mock_weather_db[city_normalized]
+            "report": f"The weather in {data.name} is {data.condition} "
+            f"with a temperature of {format_temperature(data.temp_c, 'Celsius')}.",
+        }
     else:
         return {
             "status": "error",
@@ -42,7 +68,14 @@ def get_weather(city: str) -> dict:
         }
 
 
-def get_weather_stateful(city: str, tool_context: ToolContext) -> dict:
+def format_temperature(temp_c: float, unit: str) -> str:
+    """Formats a Celsius temperature in the given unit ('Celsius' or 'Fahrenheit')."""
+    if unit == "Fahrenheit":
+        return f"{(temp_c * 9 / 5) + 32:.0f}°F"  # Calculate Fahrenheit
+    return f"{temp_c:.0f}°C"  # Default to Celsius
+
+
+async def get_weather_stateful(city: str, tool_context: ToolContext) -> dict:
     """Retrieves weather, converts temp unit based on session state."""
     print(f"--- Tool: get_weather_stateful called for {city} ---")
 
@@ -54,29 +87,22 @@ def get_weather_stateful(city: str, tool_context: ToolContext) -> dict:
         f"--- Tool: Reading state 'user_preference_temperature_unit': {preferred_unit} ---"
     )
 
-    city_normalized = city.lower().replace(" ", "")
-
-    # Mock weather data (always stored in Celsius internally)
-    mock_weather_db = {
-        "newyork": {"temp_c": 25, "condition": "sunny"},
-        "london": {"temp_c": 15, "condition": "cloudy"},
-        "tokyo": {"temp_c": 18, "condition": "light rain"},
-    }
-
-    if city_normalized in mock_weather_db:
-        data = mock_weather_db[city_normalized]
-        temp_c = data["temp_c"]
-        condition = data["condition"]
+    # Weather data is always stored (and cached) in Celsius internally,
+    # so cached results are still converted to this user's preferred unit.
+    try:
+        data = await weather_provider.fetch(city)
+    except Exception as e:
+        print(f"--- Tool: Weather provider failed for '{city}': {e} ---")
+        return {
+            "status": "error",
+            "error_message": f"Sorry, the weather service is unavailable for '{city}'.",
+        }
+    print(f"--- Tool: Weather cache stats: {weather_provider.stats()} ---")
 
+    if data is not None:
         # Format temperature based on state preference
-        if preferred_unit == "Fahrenheit":
-            temp_value = (temp_c * 9 / 5) + 32  # Calculate Fahrenheit
-            temp_unit = "°F"
-        else:  # Default to Celsius
-            temp_value = temp_c
-            temp_unit = "°C"
-
-        report = f"The weather in {city.capitalize()} is {condition} with a temperature of {temp_value:.0f}{temp_unit}."
+        temperature = format_temperature(data.temp_c, preferred_unit)
+        report = f"The weather in {data.name} is {data.condition} with a temperature of {temperature}."
         result = {"status": "success", "report": report}
         print(f"--- Tool: Generated report in {preferred_unit}. Result: {result} ---")
 
@@ -95,6 +121,80 @@ def get_weather_stateful(city: str, tool_context: ToolContext) -> dict:
 print("✅ State-aware 'get_weather_stateful' tool defined.")
 
 
+async def get_weather_batch(cities: List[str], tool_context: ToolContext) -> dict:
+    """Retrieves the weather for several cities at once, in the user's preferred unit.
+
+    Use this instead of calling get_weather_stateful once per city.
+
+    Args:
+        cities (list[str]): The city names (e.g., ["London", "Tokyo", "New York"]).
+
+    Returns:
+        dict: 'status' is 'success' if every city was found, 'partial' if only
+              some were, and 'error' if none were. 'results' has one entry per
+              city, in the order given, with 'city' and 'status' plus either
+              'report' or 'error_message'. An empty list is an error.
+    """
+    print(f"--- Tool: get_weather_batch called for {cities} ---")
+    if not cities:
+        return {
+            "status": "error",
+            "error_message": "No cities were given. Please name at least one city.",
+        }
+    preferred_unit = tool_context.state.get(
+        "user_preference_temperature_unit", "Celsius"
+    )
+
+    # All cities are looked up concurrently; the provider's cache and
+    # coalescing also apply here (a repeated city costs one lookup).
+    lookups = await asyncio.gather(
+        *(weather_provider.fetch(city) for city in cities), return_exceptions=True
+    )
+
+    results = []
+    for city, data in zip(cities, lookups):
+        if isinstance(data, Exception):
+            results.append(
+                {
+                    "city": city,
+                    "status": "error",
+                    "error_message": f"Sorry, the weather service is unavailable for '{city}'.",
+                }
+            )
+        elif data is None:
+            results.append(
+                {
+                    "city": city,
+                    "status": "error",
+                    "error_message": f"Sorry, I don't have weather information for '{city}'.",
+                }
+            )
+        else:
+            temperature = format_temperature(data.temp_c, preferred_unit)
+            results.append(
+                {
+                    "city": city,
+                    "status": "success",
+                    "report": f"The weather in {data.name} is {data.condition} with a temperature of {temperature}.",
+                }
+            )
+
+    found = [r["city"] for r in results if r["status"] == "success"]
+    if found:
+        tool_context.state["last_city_checked_stateful"] = found[-1]
+    status = (
+        "success" if len(found) == len(results) else "partial" if found else "error"
+    )
+    print(
+        f"--- Tool: Batch of {len(cities)} in {preferred_unit}: {len(found)} found. "
+        f"Cache stats: {weather_provider.stats()} ---"
+    )
+    return {"status": status, "results": results}
+
+
+print("✅ Batch 'get_weather_batch' tool defined.")
+
+
 # Example tool usage (optional test)
 print(get_weather("New York"))
 print(get_weather("Paris"))
@@ -0,0 +1,75 @@
+# @title Weather data provider
+import csv
+import json
+import os
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Bundled mock data; set WEATHER_DATA_PATH to use another CSV or JSON file.
+DEFAULT_DATA_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "data", "weather.csv"
+)
+
+
+class CityWeather(NamedTuple):
+    name: str  # Canonical display name, e.g. "São Paulo"
+    temp_c: float  # Always stored in Celsius
+    condition: str
+
+
+def normalize_city(name: str) -> str:
+    """Normalizes a city name for lookups.
+
+    Case, diacritics, spaces and punctuation are ignored, so "São Paulo",
+    "sao paulo" and "SAO-PAULO" all become "saopaulo".
+    """
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    # Combining accents and punctuation are not alphanumeric, so they drop out.
+    return "".join(ch for ch in decomposed if ch.isalnum())
+
+
+class WeatherData:
+    """In-memory weather data indexed by normalized city name and alias.
+
+    The index is built once, so a lookup is a single dict access no matter
+    how many cities are loaded.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[CityWeather, List[str]]]):
+        self._index: Dict[str, CityWeather] = {}
+        aliases = []
+        for city, city_aliases in entries:
+            self._index.setdefault(normalize_city(city.name), city)
+            aliases.extend((alias, city) for alias in city_aliases)
+        self.cities = len(self._index)
+        # Canonical names win over aliases that happen to collide with them.
+        for alias, city in aliases:
+            self._index.setdefault(normalize_city(alias), city)
+
+    @classmethod
+    def load(cls, path: str) -> "WeatherData":
+        """Loads a CSV or JSON file of cities.
+
+        CSV columns are ``city,aliases,temp_c,condition`` with aliases
+        separated by ``|``. JSON is a list of objects with the same keys,
+        where ``aliases`` is a list.
+        """
+        with open(path, encoding="utf-8") as f:
+            if path.endswith(".json"):
+                rows = json.load(f)
+            else:
+                rows = list(csv.DictReader(f))
+        entries = []
+        for row in rows:
+            aliases = row.get("aliases") or []
+            if isinstance(aliases, str):
+                aliases = [a for a in aliases.split("|") if a]
+            city = CityWeather(row["city"], float(row["temp_c"]), row["condition"])
+            entries.append((city, aliases))
+        return cls(entries)
+
+    def lookup(self, city: str) -> Optional[CityWeather]:
+        return self._index.get(normalize_city(city))
+
+    def __len__(self) -> int:
+        return self.cities
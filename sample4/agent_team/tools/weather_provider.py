@@ -0,0 +1,124 @@
+# @title Async weather providers with caching
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from .weather_data import CityWeather, WeatherData, normalize_city
+
+
+class WeatherProvider(ABC):
+    """Base class for weather backends.
+
+    Subclasses implement ``fetch``, which returns the weather for a city
+    (temperature in Celsius) or None if the city is unknown. A real backend
+    would make its network call here.
+    """
+
+    @abstractmethod
+    async def fetch(self, city: str) -> Optional[CityWeather]:
+        """Returns the weather for ``city``, or None if it is unknown."""
+
+
+class LocalWeatherProvider(WeatherProvider):
+    """Serves the weather data file loaded at startup."""
+
+    def __init__(self, data: WeatherData):
+        self.data = data
+
+    async def fetch(self, city: str) -> Optional[CityWeather]:
+        return self.data.lookup(city)
+
+
+class FakeWeatherProvider(LocalWeatherProvider):
+    """Local stand-in for a remote backend, with a simulated round trip.
+
+    ``calls`` counts how many requests reached the "backend", which makes it
+    easy to check what the cache saved.
+    """
+
+    def __init__(self, data: WeatherData, latency: float = 0.2):
+        super().__init__(data)
+        self.latency = latency
+        self.calls = 0
+
+    async def fetch(self, city: str) -> Optional[CityWeather]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return await super().fetch(city)
+
+
+class CachedWeatherProvider(WeatherProvider):
+    """Wraps a provider with a per-city TTL cache and request coalescing.
+
+    Entries are keyed by the normalized city name and hold the Celsius
+    data, so the unit conversion still happens per call and follows each
+    user's preference. Unknown cities are cached for ``negative_ttl``.
+    Concurrent lookups of the same city share one backend request. Errors
+    are passed to every waiter and not cached.
+    """
+
+    def __init__(
+        self,
+        provider: WeatherProvider,
+        ttl: float = 600.0,
+        negative_ttl: float = 60.0,
+        maxsize: int = 10_000,
+    ):
+        self.provider = provider
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        # key -> (expires_at, weather or None). Most recently used last.
+        self._cache: "OrderedDict[str, Tuple[float, Optional[CityWeather]]]" = (
+            OrderedDict()
+        )
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    async def fetch(self, city: str) -> Optional[CityWeather]:
+        key = normalize_city(city)
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, city))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        # Shield so one caller giving up does not cancel the others' request.
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, city: str) -> Optional[CityWeather]:
+        weather = await self.provider.fetch(city)
+        ttl = self.ttl if weather is not None else self.negative_ttl
+        self._cache[key] = (time.monotonic() + ttl, weather)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return weather
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        self._in_flight.pop(key, None)
+        # Mark the error as retrieved even if every caller was cancelled.
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "size": len(self._cache),
+        }